@@ -21,9 +21,13 @@ from typing import Tuple, List
 import pandas as pd
 
 from hapray import VERSION
+from hapray.core.common.elf_index import ElfIndex
 from hapray.core.common.excel_utils import ExcelReportSaver
-from hapray.optimization_detector.file_info import FileCollector
+from hapray.core.common.worker_planner import plan_workers
+from hapray.optimization_detector.file_info import FileCollector, FileType
+from hapray.optimization_detector.hot_libraries import library_loads, select_hot_files
 from hapray.optimization_detector.invoke_symbols import InvokeSymbols
+from hapray.optimization_detector.known_binaries import KnownBinaries
 from hapray.optimization_detector.optimization_detector import OptimizationDetector
 
 
@@ -48,45 +52,80 @@ class OptAction:
                             help="Number of parallel jobs (default: 1)")
         parser.add_argument('--report_dir', '-r',
                             help='Directory containing reports to update')
+        parser.add_argument("--backend", choices=['auto', 'keras', 'tflite'], default='auto',
+                            help="Inference backend (default: auto, TFLite when the converted model is available)")
+        parser.add_argument("--no-chunk-cache", action='store_true',
+                            help="Disable the persistent chunk prediction cache")
+        parser.add_argument("--min-load", type=float, default=None,
+                            help="With --report_dir, only analyze libraries with at least this share (percent) "
+                                 "of the sampled load")
+        parser.add_argument("--top-k", type=int, default=None,
+                            help="With --report_dir, only analyze the K libraries with the highest sampled load")
+        parser.add_argument("--sample-tolerance", type=float, default=None,
+                            help="Infer random chunks of large binaries until the 95%% confidence interval of the "
+                                 "optimization score is within +/- this value (e.g. 0.02), instead of every chunk")
+        parser.add_argument("--known-list", action='append', default=[],
+                            help="File listing binaries to skip as system libraries, one '<md5>[,<name>[,<reason>]]' "
+                                 "per line; entries are kept in the known binaries database for later runs "
+                                 "(can be given multiple times)")
         parsed_args = parser.parse_args(args)
 
         action = OptAction()
         file_collector = FileCollector()
         try:
+            for known_list in parsed_args.known_list:
+                KnownBinaries.get_instance().import_list(known_list)
+
             logging.info(f"Collecting binary files from: {parsed_args.input}")
-            file_infos = file_collector.collect_binary_files(parsed_args.input)
+            file_infos = file_collector.collect_binary_files(parsed_args.input, parsed_args.jobs)
 
             if not file_infos:
                 logging.warning("No valid binary files found")
                 return
 
-            logging.info(f"Starting optimization detection on {len(file_infos)} files")
+            # Analyze only libraries that carry sampled load in the report
+            cold_files = []
+            ranking = None
+            if parsed_args.report_dir and (parsed_args.min_load is not None or parsed_args.top_k is not None):
+                file_infos, cold_files, ranking = select_hot_files(
+                    file_infos, library_loads(parsed_args.report_dir), parsed_args.min_load, parsed_args.top_k)
 
-            with ProcessPoolExecutor(max_workers=2) as executor:
-                futures = []
-                future = executor.submit(action._run_detection, parsed_args.jobs, file_infos)
-                futures.append(future)
-                if parsed_args.report_dir:
-                    future = executor.submit(action._run_invoke_analysis, file_infos, parsed_args.report_dir)
-                    futures.append(future)
+            # Build the persistent ELF index once, shared by all workers and later runs.
+            # HAP members are parsed from memory and do not need it.
+            ElfIndex.get_instance().index_paths(
+                [fi.absolute_path for fi in file_infos if fi.file_type == FileType.SO and fi.data is None],
+                parsed_args.jobs)
 
-            data = []
-            # Wait for all report generation tasks
-            for future in futures:
-                data.extend(future.result())
+            logging.info(f"Starting optimization detection on {len(file_infos)} files")
+            plan = plan_workers(parsed_args.jobs, with_invoke=bool(parsed_args.report_dir))
+
+            # file_infos carry in-memory HAP members, so they are pickled to one child only: detection runs
+            # in a separate process while invoke analysis, which waits on hapray elf processes, runs here
+            invoke_data = []
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(action._run_detection, parsed_args.jobs, file_infos,
+                                         parsed_args.backend, not parsed_args.no_chunk_cache, cold_files, plan,
+                                         parsed_args.sample_tolerance)
+                if parsed_args.report_dir:
+                    invoke_data = action._run_invoke_analysis(file_infos, parsed_args.report_dir,
+                                                              plan.invoke_workers)
+                data = future.result() + invoke_data
+            if ranking is not None:
+                data.append(('library_load', ranking))
             action._generate_excel_report(data, parsed_args.output)
             logging.info(f"Analysis report saved to: {parsed_args.output}")
         finally:
             file_collector.cleanup()
 
-    def _run_detection(self, jobs, file_infos):
+    def _run_detection(self, jobs, file_infos, backend='auto', chunk_cache=True, cold_files=None, plan=None,
+                       sample_tolerance=None):
         """Run optimization detection in a separate process"""
-        detector = OptimizationDetector(jobs)
-        return detector.detect_optimization(file_infos)
+        detector = OptimizationDetector(jobs, backend, chunk_cache, plan, sample_tolerance)
+        return detector.detect_optimization(file_infos, cold_files)
 
-    def _run_invoke_analysis(self, file_infos, report_dir):
-        """Run invoke symbols analysis in a separate process"""
-        invoke_symbols = InvokeSymbols()
+    def _run_invoke_analysis(self, file_infos, report_dir, max_concurrency=None):
+        """Run invoke symbols analysis in this process, alongside the detection process"""
+        invoke_symbols = InvokeSymbols(max_concurrency=max_concurrency)
         return invoke_symbols.analyze(file_infos, report_dir)
 
     def _generate_excel_report(self, data: List[Tuple[str, pd.DataFrame]], output_file: str) -> None:
@@ -15,20 +15,24 @@ limitations under the License.
 
 import os
 import re
+import json
 import shutil
 import time
 import logging
 import argparse
-from concurrent.futures import ThreadPoolExecutor
-from typing import List
-
-from xdevice.__main__ import main_process
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
 
 from hapray import VERSION
 from hapray.core.config.config import Config
+from hapray.core.capture_profile import get_capture_profile, warn_reduced_perf_settings
 from hapray.core.common.common_utils import CommonUtils
-from hapray.core.common.folder_utils import scan_folders, delete_folder
+from hapray.core.device_scheduler import DeviceDriver, DeviceScheduler, RoundTask, XDeviceDriver, list_devices
 from hapray.core.report import ReportGenerator, create_perf_summary_excel
+from hapray.core.round_pipeline import RoundPipeline
+from hapray.core.step_splitter import is_continuous, split_session_perf
 
 ENV_ERR_STR = """
 The hdc or node command is not in PATH. 
@@ -65,6 +69,96 @@ class PerfAction:
                     matched_cases.append(pattern)
         return matched_cases
 
+    @staticmethod
+    def generate_case_report(report_generator: ReportGenerator, round_futures: List[Optional[Future]],
+                             scene_round_dirs: List[str], merge_folder_path: str) -> bool:
+        """Generates the report of a case once the data of all its rounds is converted."""
+        for future, round_dir in zip(round_futures, scene_round_dirs):
+            if future is not None:
+                future.result()
+            elif is_continuous(round_dir):
+                # Without the pipeline, continuous sessions are split here before round selection
+                split_session_perf(round_dir)
+        return report_generator.generate_report(scene_round_dirs, merge_folder_path)
+
+    @staticmethod
+    def capture_round(driver: DeviceDriver, task: RoundTask, output: str, device_sn: Optional[str]) -> bool:
+        """Runs a round on a device, re-capturing only the steps whose data is incomplete.
+
+        Steps of a continuous capture share one session, so an incomplete continuous round
+        is always captured again as a whole.
+        """
+        from hapray.core.common.folder_utils import find_incomplete_steps, delete_folder
+
+        check_trace = bool(Config.get('trace.enable'))
+        continuous = bool(Config.get('capture.continuous'))
+        driver.run_case(task, output, device_sn)
+        for attempt in range(5):
+            failed_steps = find_incomplete_steps(output, check_trace)
+            if failed_steps == []:
+                return True
+            if failed_steps is None or continuous:
+                # The test case did not finish or its session is incomplete, nothing of the round can be kept
+                delete_folder(output)
+                logging.warning(f'Round did not complete, retrying ({attempt + 1}/5) for {output}')
+                driver.run_case(task, output, device_sn)
+            else:
+                logging.warning(f'Incomplete data of steps {failed_steps}, re-capturing them '
+                                f'({attempt + 1}/5) for {output}')
+                driver.run_case(task, output, device_sn, failed_steps)
+        return find_incomplete_steps(output, check_trace) == []
+
+    @staticmethod
+    def run_rounds(tasks: List[RoundTask], devices: List[Optional[str]], driver: DeviceDriver, reports_path: str,
+                   pipeline: RoundPipeline,
+                   on_case_done: Callable[[str, List[str], List[Optional[Future]]], None]) -> None:
+        """Runs all rounds sharded over the devices.
+
+        With several devices every device captures into its own folder under
+        reports/<timestamp>/devices/<sn>/; complete rounds are moved to
+        reports/<timestamp>/<case>_round<N>, where round selection expects them, and the
+        device of every round is recorded in devices.json.
+
+        Args:
+            on_case_done: Called with the round folders and pipeline futures of a case as
+                soon as all its rounds are finished, on any device
+        """
+        sharded = len(devices) > 1
+        remaining = Counter(task.case_name for task in tasks)
+        finished = {case_name: {} for case_name in remaining}
+        placement = {}
+        lock = threading.Lock()
+
+        def run_task(task: RoundTask, device: Optional[str]):
+            output = os.path.join(reports_path, task.name)
+            capture_dir = os.path.join(reports_path, 'devices', device, task.name) if sharded else output
+            try:
+                captured = PerfAction.capture_round(driver, task, capture_dir, device)
+                if captured and sharded:
+                    shutil.move(capture_dir, output)
+            except Exception as e:
+                logging.exception(f'Round {task.name} failed on device {device}: {e}')
+                captured = False
+            future = pipeline.submit(output) if captured else None
+
+            with lock:
+                if captured:
+                    finished[task.case_name][task.round_num] = (output, future)
+                    placement[task.name] = device
+                remaining[task.case_name] -= 1
+                case_done = remaining[task.case_name] == 0
+            if case_done:
+                rounds = [finished[task.case_name][num] for num in sorted(finished[task.case_name])]
+                on_case_done(task.case_name, [folder for folder, _ in rounds], [future for _, future in rounds])
+
+        scheduler = DeviceScheduler(devices)
+        scheduler.assign(tasks)
+        scheduler.run(run_task)
+
+        if sharded:
+            with open(os.path.join(reports_path, 'devices.json'), 'w', encoding='utf-8') as f:
+                json.dump(placement, f, indent=2, sort_keys=True)
+
     @staticmethod
     def execute(args):
         """Executes performance testing workflow."""
@@ -88,6 +182,18 @@ class PerfAction:
         parser.add_argument('--circles', action="store_true", help="Enable CPU cycle sampling")
         parser.add_argument('--round', type=int, default=5, help="Specify test round")
         parser.add_argument('--no-trace', action='store_true', help="Disable trace capturing")
+        parser.add_argument('--continuous', action='store_true',
+                            help="Capture each test case in one continuous session and split it into steps "
+                                 "on the host")
+        parser.add_argument('--capture-profile', choices=['minimal', 'frames-only', 'full', 'analyzers'],
+                            default=None,
+                            help="What to capture per step: a named profile, or 'analyzers' to capture only the "
+                                 "trace data the enabled analyzers read, keeping at least the frames-only hiperf "
+                                 "settings the load report needs; 'minimal' also reduces hiperf to fp call stacks "
+                                 "at 500 Hz (default: capture.profile in config)")
+        parser.add_argument('--devices', nargs='+', default=None,
+                            help="Serial numbers of the devices to shard test cases across "
+                                 "(default: all devices connected via hdc)")
         parsed_args = parser.parse_args(args)
 
         root_path = os.getcwd()
@@ -107,12 +213,20 @@ class PerfAction:
         else:
             Config.set('trace.enable', True)
 
+        if parsed_args.capture_profile is not None:
+            Config.set('capture.profile', parsed_args.capture_profile)
+        warn_reduced_perf_settings(get_capture_profile())
+
+        if parsed_args.continuous:
+            Config.set('capture.continuous', True)
+
         all_testcases = CommonUtils.load_all_testcases()
 
         if parsed_args.so_dir is not None:
             Config.set('so_dir', parsed_args.so_dir)
 
-        with ThreadPoolExecutor(max_workers=4) as executor:
+        # Finished rounds are converted by the pipeline while the device captures the next round
+        with ThreadPoolExecutor(max_workers=4) as executor, RoundPipeline() as pipeline:
             futures = []
             report_generator = ReportGenerator()
             run_testcases = Config.get('run_testcases', [])
@@ -128,31 +242,27 @@ class PerfAction:
 
             logging.info(f"Found {len(matched_cases)} test cases for execution")
 
-            for case_name in matched_cases:
-                scene_round_dirs = []
-                for round_num in range(parsed_args.round):
-                    case_dir = all_testcases[case_name]
-                    output = os.path.join(reports_path, f'{case_name}_round{round_num}')
-                    main_process(f'run -l {case_name} -tcpath {case_dir} -rp {output}')
-
-                    # Verify and retry if data is incomplete
-                    for attempt in range(5):
-                        if scan_folders(output):
-                            scene_round_dirs.append(output)
-                            break
-                        else:
-                            if delete_folder(output):
-                                logging.warning(f'Incomplete perf.data, retrying ({attempt + 1}/5) for {output}')
-                                main_process(f'run -l {case_name} -tcpath {case_dir} -rp {output}')
+            devices = parsed_args.devices or list_devices() or [None]
+            if len(devices) > 1:
+                logging.info(f"Sharding test cases across {len(devices)} devices: {', '.join(devices)}")
+            # xdevice keeps global state per run, so several devices need one process per round
+            driver = XDeviceDriver(isolated=len(devices) > 1)
+            tasks = [RoundTask(case_name, all_testcases[case_name], round_num)
+                     for case_name in matched_cases for round_num in range(parsed_args.round)]
 
+            def on_case_done(case_name: str, scene_round_dirs: List[str], round_futures: List[Optional[Future]]):
                 merge_folder_path = os.path.join(reports_path, case_name)
                 future = executor.submit(
-                    report_generator.generate_report,
+                    PerfAction.generate_case_report,
+                    report_generator,
+                    round_futures,
                     scene_round_dirs,
                     merge_folder_path
                 )
                 futures.append(future)
 
+            PerfAction.run_rounds(tasks, devices, driver, reports_path, pipeline, on_case_done)
+
             # Wait for all report generation tasks
             for future in futures:
                 future.result()
@@ -23,12 +23,15 @@ import json
 
 from hapray.analyze.base_analyzer import BaseAnalyzer
 from hapray.core.common.exe_utils import ExeUtils
+from hapray.core.config.config import Config
+from hapray.core.step_splitter import prepare_step_trace
 
 # Configuration constants
 MAX_WORKERS = 4  # Optimal for I/O-bound tasks
 ANALYZER_CLASSES = [
     'ComponentReusableAnalyzer',
     'PerfAnalyzer',
+    'ComponentLoadAnalyzer',
     'EmptyFrameAnalyzer',
     'FrameDropAnalyzer',
     # Add more analyzers here
@@ -75,13 +78,13 @@ def analyze_data(scene_dir: str):
 
 
 def _initialize_analyzers(scene_dir: str) -> List[BaseAnalyzer]:
-    """Initialize all registered analyzers.
+    """Initialize the enabled analyzers (`analyze.analyzers`, by default all registered ones).
 
     Returns:
         List of initialized analyzer instances
     """
     analyzers = []
-    for analyzer_class in ANALYZER_CLASSES:
+    for analyzer_class in Config.get('analyze.analyzers', None) or ANALYZER_CLASSES:
         try:
             module_name = camel_to_snake(analyzer_class)
             module = __import__(f'hapray.analyze.{module_name}',
@@ -164,6 +167,8 @@ def _process_single_step(
     trace_db = os.path.join(scene_dir, 'htrace', step_dir, 'trace.db')
     perf_db = os.path.join(scene_dir, 'hiperf', step_dir, 'perf.db')
 
+    # Steps of a continuous capture get their trace window cut from the session trace
+    prepare_step_trace(scene_dir, step_dir)
     if not os.path.exists(trace_db) and os.path.exists(htrace_file):
         logging.info(f"Converting htrace to db for {step_dir}...")
         if not ExeUtils.convert_data_to_db(htrace_file, trace_db):
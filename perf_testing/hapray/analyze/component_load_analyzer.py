@@ -0,0 +1,43 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+from typing import Dict, Any
+
+from hapray.analyze.base_analyzer import BaseAnalyzer
+from hapray.core.common.component_classifier import get_component_loads
+
+
+class ComponentLoadAnalyzer(BaseAnalyzer):
+    """Analyzer for per-component load breakdown based on the `kind` configuration"""
+
+    def __init__(self, scene_dir: str):
+        super().__init__(scene_dir, 'component_load_analysis.json')
+
+    def _analyze_impl(self, step_dir: str, trace_db_path: str, perf_db_path: str) -> Dict[str, Any]:
+        """Compute component loads for a single step.
+
+        Args:
+            step_dir: Identifier for the current step
+            trace_db_path: Path to trace database (unused in this analyzer)
+            perf_db_path: Path to performance database
+
+        Returns:
+            Dictionary containing total load and loads per component
+        """
+        if not os.path.exists(perf_db_path):
+            return {}
+
+        return get_component_loads(perf_db_path)
@@ -0,0 +1,155 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+from typing import List, NamedTuple, Optional, Tuple
+
+from hapray.analyze import ANALYZER_CLASSES
+from hapray.core.config.config import Config
+
+DEFAULT_PROFILE = 'full'
+# Profile derived from the analyzers enabled in `analyze.analyzers`
+ANALYZERS_PROFILE = 'analyzers'
+
+# Thread/process lifecycle events, needed to map trace data to threads and processes
+_SCHED_EVENTS = (
+    'sched/sched_switch',
+    'sched/sched_wakeup',
+    'sched/sched_wakeup_new',
+    'sched/sched_waking',
+    'sched/sched_process_exit',
+    'sched/sched_process_free',
+    'task/task_newtask',
+    'task/task_rename',
+)
+_ALL_EVENTS = (
+    'sched/sched_switch',
+    'power/suspend_resume',
+    'sched/sched_wakeup',
+    'sched/sched_wakeup_new',
+    'sched/sched_waking',
+    'sched/sched_process_exit',
+    'sched/sched_process_free',
+    'task/task_newtask',
+    'task/task_rename',
+    'power/cpu_frequency',
+    'power/cpu_idle',
+)
+# Categories that produce the ArkUI, render service and VSync slices frame analysis is based on
+_FRAME_CATEGORIES = ('ace', 'app', 'graphic', 'window')
+_ALL_CATEGORIES = (
+    'ability', 'ace', 'app', 'ark', 'binder', 'disk', 'freq', 'graphic', 'idle', 'irq', 'memreclaim', 'mmc',
+    'multimodalinput', 'notification', 'ohos', 'pagecache', 'rpc', 'sched', 'sync', 'window', 'workq',
+    'zaudio', 'zcamera', 'zimage', 'zmedia',
+)
+
+
+class CaptureProfile(NamedTuple):
+    """What hiprofiler and hiperf capture for a step."""
+    name: str
+    ftrace_events: Tuple[str, ...]
+    hitrace_categories: Tuple[str, ...]
+    buffer_size_kb: int  # ftrace buffer per CPU
+    buffer_pages: int  # hiprofiler session buffer
+    call_stack: str  # hiperf --call-stack
+    frequency: int  # hiperf -f
+    mmap_pages: int  # hiperf -m
+
+
+CAPTURE_PROFILES = {
+    'minimal': CaptureProfile('minimal', ('sched/sched_switch', 'task/task_newtask', 'task/task_rename'),
+                              ('ace', 'app'), 32768, 2048, 'fp', 500, 256),
+    'frames-only': CaptureProfile('frames-only', _SCHED_EVENTS, _FRAME_CATEGORIES, 65536, 4096, 'dwarf', 1000, 512),
+    'full': CaptureProfile('full', _ALL_EVENTS, _ALL_CATEGORIES, 204800, 16384, 'dwarf', 1000, 1024),
+}
+
+
+class AnalyzerRequirement(NamedTuple):
+    """Trace and perf data an analyzer reads."""
+    ftrace_events: Tuple[str, ...]
+    hitrace_categories: Tuple[str, ...]
+    trace_profile: Optional[str]  # Profile whose trace buffers fit the data, None if the trace is not read
+    perf_profile: str  # Profile whose hiperf settings the analyzer needs
+
+
+ANALYZER_REQUIREMENTS = {
+    'ComponentReusableAnalyzer': AnalyzerRequirement((), ('ace',), 'minimal', 'minimal'),
+    'PerfAnalyzer': AnalyzerRequirement((), (), None, 'full'),
+    'ComponentLoadAnalyzer': AnalyzerRequirement((), (), None, 'full'),
+    'EmptyFrameAnalyzer': AnalyzerRequirement(_SCHED_EVENTS, _FRAME_CATEGORIES, 'frames-only', 'frames-only'),
+    'FrameDropAnalyzer': AnalyzerRequirement(_SCHED_EVENTS, _FRAME_CATEGORIES, 'frames-only', 'frames-only'),
+}
+_PROFILE_ORDER = ['minimal', 'frames-only', 'full']
+# dbtools round selection and the load report read perf.db whatever Python analyzers run,
+# so derived hiperf settings keep their dwarf call stacks and sampling frequency
+REPORT_PERF_PROFILE = 'frames-only'
+
+
+def get_enabled_analyzers() -> List[str]:
+    """Analyzers run on the captured data: `analyze.analyzers`, or all registered analyzers."""
+    return Config.get('analyze.analyzers', None) or list(ANALYZER_CLASSES)
+
+
+def derive_capture_profile(analyzers: List[str]) -> CaptureProfile:
+    """Build the smallest profile that still captures what the given analyzers read.
+
+    Trace events and categories are the union of the requirements; trace buffers and
+    hiperf settings are each taken from the largest profile any analyzer needs for them,
+    hiperf settings never below REPORT_PERF_PROFILE. Unknown analyzers get the full profile.
+    """
+    unknown = [name for name in analyzers if name not in ANALYZER_REQUIREMENTS]
+    if unknown:
+        logging.warning("No capture requirements for %s, using the full profile", ', '.join(unknown))
+        return CAPTURE_PROFILES['full']
+
+    # The minimal events keep thread and process names resolvable in the trace
+    ftrace_events, categories = list(CAPTURE_PROFILES['minimal'].ftrace_events), []
+    trace_profile, perf_profile = 'minimal', REPORT_PERF_PROFILE
+    for name in analyzers:
+        requirement = ANALYZER_REQUIREMENTS[name]
+        ftrace_events.extend(event for event in requirement.ftrace_events if event not in ftrace_events)
+        categories.extend(category for category in requirement.hitrace_categories if category not in categories)
+        if requirement.trace_profile:
+            trace_profile = max(trace_profile, requirement.trace_profile, key=_PROFILE_ORDER.index)
+        perf_profile = max(perf_profile, requirement.perf_profile, key=_PROFILE_ORDER.index)
+
+    trace_settings, perf_settings = CAPTURE_PROFILES[trace_profile], CAPTURE_PROFILES[perf_profile]
+    return CaptureProfile(ANALYZERS_PROFILE, tuple(ftrace_events), tuple(categories),
+                          trace_settings.buffer_size_kb, trace_settings.buffer_pages,
+                          perf_settings.call_stack, perf_settings.frequency, perf_settings.mmap_pages)
+
+
+def warn_reduced_perf_settings(profile: CaptureProfile):
+    """Warn when a named profile samples hiperf below REPORT_PERF_PROFILE.
+
+    Derived profiles never do; 'minimal' is applied as configured, so its fp call stacks and
+    lower sampling frequency degrade dbtools round selection and the component load report.
+    """
+    if profile.name in _PROFILE_ORDER and \
+            _PROFILE_ORDER.index(profile.name) < _PROFILE_ORDER.index(REPORT_PERF_PROFILE):
+        logging.warning("Capture profile %s records hiperf with %s call stacks at %d Hz, below the %s settings "
+                        "the load report needs; perf results will be less accurate",
+                        profile.name, profile.call_stack, profile.frequency, REPORT_PERF_PROFILE)
+
+
+def get_capture_profile(name: Optional[str] = None) -> CaptureProfile:
+    """Resolve a capture profile by name, by default the one configured in `capture.profile`."""
+    name = name or Config.get('capture.profile', DEFAULT_PROFILE) or DEFAULT_PROFILE
+    if name == ANALYZERS_PROFILE:
+        return derive_capture_profile(get_enabled_analyzers())
+    if name not in CAPTURE_PROFILES:
+        logging.warning("Unknown capture profile %s, using %s", name, DEFAULT_PROFILE)
+        return CAPTURE_PROFILES[DEFAULT_PROFILE]
+    return CAPTURE_PROFILES[name]
@@ -0,0 +1,27 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+
+from hapray.core.config.config import Config
+
+DEFAULT_CACHE_DIR = os.path.join('~', '.hapray', 'cache')
+
+
+def get_cache_dir() -> str:
+    """Return the absolute cache directory (config `cache.dir`), creating it if needed."""
+    cache_dir = os.path.abspath(os.path.expanduser(Config.get('cache.dir', DEFAULT_CACHE_DIR)))
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
@@ -19,8 +19,11 @@ import subprocess
 import time
 from importlib.resources import files
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from hypium import UiDriver
+if TYPE_CHECKING:
+    # hypium is heavy to import and only needed on the device side (perf action)
+    from hypium import UiDriver
 
 
 class CommonUtils(object):
@@ -45,25 +48,25 @@ class CommonUtils(object):
         return ret
 
     @staticmethod
-    def swipes_up_load(driver: UiDriver, swip_num: int, sleep: int, timeout=300):
+    def swipes_up_load(driver: 'UiDriver', swip_num: int, sleep: int, timeout=300):
         for _ in range(swip_num):
             CommonUtils.swipe(driver.device_sn, 630, 1904, 630, 954, timeout)
             time.sleep(sleep)
 
     @staticmethod
-    def swipes_down_load(driver: UiDriver, swip_num: int, sleep: int, timeout=300):
+    def swipes_down_load(driver: 'UiDriver', swip_num: int, sleep: int, timeout=300):
         for _ in range(swip_num):
             CommonUtils.swipe(driver.device_sn, 630, 816, 630, 1766, timeout)
             time.sleep(sleep)
 
     @staticmethod
-    def swipes_left_load(driver: UiDriver, swip_num: int, sleep: int, timeout=300):
+    def swipes_left_load(driver: 'UiDriver', swip_num: int, sleep: int, timeout=300):
         for _ in range(swip_num):
             CommonUtils.swipe(driver.device_sn, 1008, 1360, 504, 1360, timeout)
             time.sleep(sleep)
 
     @staticmethod
-    def swipes_right_load(driver: UiDriver, swip_num: int, sleep: int, timeout=300):
+    def swipes_right_load(driver: 'UiDriver', swip_num: int, sleep: int, timeout=300):
         for _ in range(swip_num):
             CommonUtils.swipe(driver.device_sn, 504, 1360, 1008, 1360, timeout)
             time.sleep(sleep)
@@ -0,0 +1,298 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from hapray.core.common.common_utils import CommonUtils
+from hapray.core.config.config import Config
+
+# Component categories, kept in sync with ComponentCategory in hapray-toolbox
+APP_ABC = 0
+APP_SO = 1
+SYS_SDK = 4
+UNKNOWN = -1
+
+# Category used by hapray-toolbox for the user `kind` configuration
+USER_KIND_ENTRY = {'name': 'APP_SO', 'kind': APP_SO}
+
+_PID_PATTERN = re.compile(r'/proc/(\d+)/')
+_BUNDLE_PATTERN = re.compile(r'/proc/.*/data/storage/.*/bundle/.*')
+_REGEX_MARKERS = ('$', 'd+', '.*', '.+')
+
+# Leaf frame (highest depth) of every callchain
+_CALLCHAIN_LEAF_SQL = """
+SELECT callchain_id, file_id, MAX(depth)
+FROM perf_callchain
+GROUP BY callchain_id
+"""
+
+
+def _has_regex_chars(pattern: str) -> bool:
+    """Mirrors PerfAnalyzerBase.hasRegexChart in hapray-toolbox."""
+    return any(marker in pattern for marker in _REGEX_MARKERS)
+
+
+def _lookup(keys: np.ndarray, values: np.ndarray, query: np.ndarray, default: int) -> np.ndarray:
+    """Vectorized dict lookup: map every query key to its value, or default if absent.
+
+    Args:
+        keys: Sorted unique keys
+        values: Values aligned with keys
+        query: Keys to look up
+        default: Value for keys not present
+
+    Returns:
+        Array of looked-up values with the shape of query
+    """
+    if keys.size == 0:
+        return np.full(query.shape, default, dtype=np.int64)
+    pos = np.searchsorted(keys, query)
+    pos = np.clip(pos, 0, keys.size - 1)
+    return np.where(keys[pos] == query, values[pos], default)
+
+
+class ComponentClassifier:
+    """Classifies perf files and threads into components of the `kind` configuration.
+
+    Files and threads are classified with the same `kind` rules as in hapray-toolbox:
+    exact file paths first, then file regexes in configuration order, then exact
+    basenames; threads are matched by regex and take precedence over the file
+    classification of a sample. All regexes are compiled into a single matcher so each
+    distinct path or thread name is matched once, and samples are mapped to components
+    with array lookups.
+
+    Samples are attributed to the file of their leaf frame only. Unlike dbtools, pure
+    compute frames are not skipped and samples of all processes are counted, so the
+    breakdown is a quick overview and does not match the loads of the HTML report.
+    """
+
+    def __init__(self, kinds: List[Dict[str, Any]]):
+        # (category, category_name, component_name) per component index
+        self.components: List[Tuple[int, str, str]] = []
+        self._component_index: Dict[Tuple[int, str, str], int] = {}
+        self._file_exact: Dict[str, int] = {}
+        file_patterns: List[Tuple[str, int]] = []
+        thread_patterns: List[Tuple[str, int]] = []
+
+        for kind in kinds:
+            for sub in kind.get('components', []):
+                index = self._register(kind['kind'], kind['name'], sub['name'])
+                for thread in sub.get('threads') or sub.get('thread') or []:
+                    thread_patterns.append((thread, index))
+                for file in sub.get('files', []):
+                    if _has_regex_chars(file):
+                        file_patterns.append((file, index))
+                    else:
+                        self._file_exact[file] = index
+
+        self._file_matcher, self._file_groups = self._compile(file_patterns)
+        self._thread_matcher, self._thread_groups = self._compile(thread_patterns)
+
+        self._sys_sdk = self._register(SYS_SDK, 'SYS_SDK', 'SYS_SDK')
+        self._app_so = self._register(APP_SO, 'APP_SO', 'APP_SO')
+        self._app_abc = self._register(APP_ABC, 'APP_ABC', 'APP_ABC')
+
+    @classmethod
+    def from_config(cls) -> 'ComponentClassifier':
+        """Build a classifier from the toolbox defaults plus the user `kind` configuration."""
+        kinds = []
+        kind_file = os.path.join(CommonUtils.get_project_root(), 'hapray-toolbox', 'res', 'perf', 'kind.json')
+        if os.path.exists(kind_file):
+            with open(kind_file, 'r', encoding='utf-8') as f:
+                kinds.extend(json.load(f))
+        else:
+            logging.debug('Not found file %s', kind_file)
+
+        user_kind = Config.get('kind', None)
+        if user_kind:
+            kinds.append(dict(USER_KIND_ENTRY, components=user_kind))
+        return cls(kinds)
+
+    def _register(self, category: int, category_name: str, component_name: str) -> int:
+        key = (category, category_name, component_name)
+        if key not in self._component_index:
+            self._component_index[key] = len(self.components)
+            self.components.append(key)
+        return self._component_index[key]
+
+    @staticmethod
+    def _compile(patterns: List[Tuple[str, int]]) -> Tuple[Optional[re.Pattern], Dict[str, int]]:
+        """Compile patterns into one alternation where the first matching pattern wins.
+
+        Each alternative is prefixed with a lazy `.*?` and applied with `match`, so the
+        alternatives are tried in order with search semantics, like RegExp.match in JS.
+        """
+        alternatives = []
+        groups = {}
+        for i, (pattern, index) in enumerate(patterns):
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                logging.error(f"Invalid kind pattern: {pattern}, error: {e}")
+                continue
+            name = f'k{i}'
+            alternatives.append(f'(?P<{name}>.*?(?:{pattern}))')
+            groups[name] = index
+        if not alternatives:
+            return None, groups
+        return re.compile('|'.join(alternatives), re.DOTALL), groups
+
+    @staticmethod
+    def _match(matcher: Optional[re.Pattern], groups: Dict[str, int], text: str) -> int:
+        if matcher is None or not text:
+            return UNKNOWN
+        match = matcher.match(text)
+        if match is None:
+            return UNKNOWN
+        return groups[match.lastgroup]
+
+    def classify_file(self, path: str) -> int:
+        """Return the component index of a perf file path; files without a path count as SYS_SDK."""
+        if not path:
+            return self._sys_sdk
+        pid_match = _PID_PATTERN.search(path)
+        if pid_match:
+            path = path.replace(f'/{pid_match.group(1)}/', '/{pid}/')
+
+        if path in self._file_exact:
+            return self._file_exact[path]
+
+        index = self._match(self._file_matcher, self._file_groups, path)
+        if index != UNKNOWN:
+            return index
+
+        if _BUNDLE_PATTERN.match(path):
+            if path.endswith('.so') or '/bundle/libs/' in path:
+                return self._app_so
+            return self._app_abc
+
+        return self._file_exact.get(os.path.basename(path), self._sys_sdk)
+
+    def classify_thread(self, name: str) -> int:
+        """Return the component index of a thread name, or UNKNOWN if no thread rule matches."""
+        return self._match(self._thread_matcher, self._thread_groups, name)
+
+    def classify_files(self, paths: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.classify_file(p) for p in paths), dtype=np.int64)
+
+    def classify_threads(self, names: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.classify_thread(n) for n in names), dtype=np.int64)
+
+    def classify_samples(self, perf_conn: sqlite3.Connection) -> Tuple[np.ndarray, np.ndarray]:
+        """Map every perf sample to a component.
+
+        Args:
+            perf_conn: Connection to a perf.db
+
+        Returns:
+            Tuple (component index per sample, event_count per sample)
+        """
+        files = perf_conn.execute('SELECT file_id, path FROM perf_files GROUP BY file_id').fetchall()
+        file_ids = np.array([row[0] for row in files], dtype=np.int64)
+        file_components = self.classify_files(row[1] for row in files)
+        order = np.argsort(file_ids)
+        file_ids, file_components = file_ids[order], file_components[order]
+
+        threads = perf_conn.execute('SELECT thread_id, thread_name FROM perf_thread').fetchall()
+        thread_ids = np.array([row[0] for row in threads], dtype=np.int64)
+        thread_components = self.classify_threads(row[1] for row in threads)
+        thread_ids, unique_pos = np.unique(thread_ids, return_index=True)
+        thread_components = thread_components[unique_pos]
+
+        leaves = np.array(perf_conn.execute(_CALLCHAIN_LEAF_SQL).fetchall(), dtype=np.int64).reshape(-1, 3)
+        order = np.argsort(leaves[:, 0])
+        callchain_ids, callchain_files = leaves[order, 0], leaves[order, 1]
+
+        samples = np.array(
+            perf_conn.execute('SELECT callchain_id, thread_id, event_count FROM perf_sample').fetchall(),
+            dtype=np.int64
+        ).reshape(-1, 3)
+
+        sample_files = _lookup(callchain_ids, callchain_files, samples[:, 0], UNKNOWN)
+        sample_components = _lookup(file_ids, file_components, sample_files, self._sys_sdk)
+        sample_threads = _lookup(thread_ids, thread_components, samples[:, 1], UNKNOWN)
+        sample_components = np.where(sample_threads != UNKNOWN, sample_threads, sample_components)
+        return sample_components, samples[:, 2]
+
+    def component_loads(self, perf_db_path: str) -> Dict[str, Any]:
+        """Compute the per-component load breakdown of a perf.db.
+
+        Args:
+            perf_db_path: Path to performance database
+
+        Returns:
+            Dictionary with the total load and the components sorted by load
+        """
+        with sqlite3.connect(perf_db_path) as conn:
+            sample_components, event_counts = self.classify_samples(conn)
+
+        loads = np.bincount(sample_components, weights=event_counts, minlength=len(self.components))
+        total_load = int(event_counts.sum())
+        components = []
+        for index in np.argsort(-loads):
+            if loads[index] <= 0:
+                break
+            category, category_name, component_name = self.components[index]
+            components.append({
+                'category': category,
+                'category_name': category_name,
+                'component': component_name,
+                'load': int(loads[index]),
+                'percentage': float(loads[index] / total_load * 100)
+            })
+        return {'total_load': total_load, 'components': components}
+
+
+# perf.db files whose component loads are kept, least recently used ones are dropped
+LOADS_CACHE_SIZE = 32
+
+_default_classifier: Optional[ComponentClassifier] = None
+# (path, mtime, size) -> loads, so a regenerated perf.db is classified again
+_loads_cache: 'OrderedDict[Tuple[str, int, int], Dict[str, Any]]' = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_component_loads(perf_db_path: str) -> Dict[str, Any]:
+    """Return the cached component load breakdown of a perf.db, computing it on first use.
+
+    The classifier is built once from the configuration and shared by all analyzers.
+    """
+    global _default_classifier
+    perf_db_path = os.path.abspath(perf_db_path)
+    stat = os.stat(perf_db_path)
+    key = (perf_db_path, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if key in _loads_cache:
+            _loads_cache.move_to_end(key)
+            return _loads_cache[key]
+        if _default_classifier is None:
+            _default_classifier = ComponentClassifier.from_config()
+        classifier = _default_classifier
+
+    loads = classifier.component_loads(perf_db_path)
+    with _lock:
+        _loads_cache[key] = loads
+        while len(_loads_cache) > LOADS_CACHE_SIZE:
+            _loads_cache.popitem(last=False)
+    return loads
@@ -0,0 +1,214 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from elftools.elf.elffile import ELFFile
+from elftools.elf.sections import NoteSection
+
+from hapray.core.common.cache_utils import get_cache_dir
+
+ELF_INDEX_DB = 'elf_index.db'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS elf_files (
+    key TEXT PRIMARY KEY,
+    build_id TEXT,
+    machine TEXT,
+    file_size INTEGER,
+    indexed_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS elf_sections (
+    key TEXT,
+    name TEXT,
+    addr INTEGER,
+    offset INTEGER,
+    size INTEGER,
+    flags INTEGER,
+    PRIMARY KEY (key, name)
+);
+CREATE TABLE IF NOT EXISTS elf_paths (
+    path TEXT PRIMARY KEY,
+    mtime REAL,
+    size INTEGER,
+    key TEXT
+);
+"""
+
+
+def _file_md5(path: str) -> str:
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def _read_build_id(elf: ELFFile) -> Optional[str]:
+    for section in elf.iter_sections():
+        if not isinstance(section, NoteSection):
+            continue
+        for note in section.iter_notes():
+            if note['n_type'] == 'NT_GNU_BUILD_ID':
+                return note['n_desc']
+    return None
+
+
+def parse_elf(path: str) -> Optional[Dict[str, Any]]:
+    """Parse the section layout of an ELF file.
+
+    Runs in worker processes, so it only returns plain data.
+
+    Args:
+        path: Path to the ELF file
+
+    Returns:
+        Index record, or None if the file is not a valid ELF
+    """
+    try:
+        with open(path, 'rb') as f:
+            elf = ELFFile(f)
+            build_id = _read_build_id(elf)
+            sections = [(section.name, section.header['sh_addr'], section.header['sh_offset'],
+                         section.header['sh_size'], section.header['sh_flags'])
+                        for section in elf.iter_sections()]
+            machine = elf['e_machine']
+    except Exception as e:
+        logging.debug("Failed to parse ELF %s: %s", path, e)
+        return None
+
+    # A build-id is shared by stripped and unstripped copies and may be reused by a rebuild,
+    # whose section offsets differ, so layouts are keyed by content
+    key = f'md5:{_file_md5(path)}'
+    return {
+        'path': path,
+        'key': key,
+        'build_id': build_id,
+        'machine': machine,
+        'file_size': os.path.getsize(path),
+        'sections': sections,
+    }
+
+
+class ElfIndex:
+    """Persistent index of ELF section layouts.
+
+    Entries are keyed by content md5, so the same library found under different paths,
+    scenes or runs is parsed only once; the GNU build-id is kept as metadata. A path table
+    remembers (mtime, size) of every indexed file to skip re-hashing unchanged files.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(get_cache_dir(), ELF_INDEX_DB)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def get_instance(cls) -> 'ElfIndex':
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = ElfIndex()
+        return cls._instance
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def key_for_path(self, path: str) -> Optional[str]:
+        """Return the index key of an already indexed, unchanged file."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._connect() as conn:
+            row = conn.execute('SELECT key, mtime, size FROM elf_paths WHERE path = ?',
+                               (os.path.abspath(path),)).fetchone()
+        # Entries of older caches were keyed by build-id and are re-indexed
+        if row and row[0].startswith('md5:') and row[1] == stat.st_mtime and row[2] == stat.st_size:
+            return row[0]
+        return None
+
+    def index_paths(self, paths: Iterable[str], workers: int = 1) -> Dict[str, str]:
+        """Index ELF files, parsing only files not seen before.
+
+        Args:
+            paths: ELF file paths
+            workers: Number of parsing processes
+
+        Returns:
+            Mapping of absolute path to index key for every valid ELF file
+        """
+        keys = {}
+        pending = []
+        for path in {os.path.abspath(p) for p in paths}:
+            key = self.key_for_path(path)
+            if key:
+                keys[path] = key
+            else:
+                pending.append(path)
+
+        if not pending:
+            return keys
+
+        logging.info("Indexing %d ELF files (%d already indexed)", len(pending), len(keys))
+        start_time = time.perf_counter()
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                records = list(executor.map(parse_elf, pending, chunksize=8))
+        else:
+            records = [parse_elf(path) for path in pending]
+
+        self._store([record for record in records if record])
+        for record in records:
+            if record:
+                keys[record['path']] = record['key']
+        logging.info("Indexed %d ELF files in %.2f seconds", len(pending), time.perf_counter() - start_time)
+        return keys
+
+    def _store(self, records: List[Dict[str, Any]]):
+        with self._connect() as conn:
+            for record in records:
+                key = record['key']
+                stat = os.stat(record['path'])
+                exists = conn.execute('SELECT 1 FROM elf_files WHERE key = ?', (key,)).fetchone()
+                if not exists:
+                    conn.execute('INSERT INTO elf_files (key, build_id, machine, file_size, indexed_at) '
+                                 'VALUES (?, ?, ?, ?, ?)',
+                                 (key, record['build_id'], record['machine'], record['file_size'],
+                                  int(time.time())))
+                    conn.executemany('INSERT OR REPLACE INTO elf_sections VALUES (?, ?, ?, ?, ?, ?)',
+                                     [(key, *section) for section in record['sections']])
+                conn.execute('INSERT OR REPLACE INTO elf_paths VALUES (?, ?, ?, ?)',
+                             (record['path'], stat.st_mtime, stat.st_size, key))
+
+    def get_section(self, path: str, name: str) -> Optional[Tuple[int, int, int]]:
+        """Return (file offset, size, address) of a section, indexing the file on demand."""
+        key = self.key_for_path(path) or self.index_paths([path]).get(os.path.abspath(path))
+        if not key:
+            return None
+        with self._connect() as conn:
+            return conn.execute('SELECT offset, size, addr FROM elf_sections WHERE key = ? AND name = ?',
+                                (key, name)).fetchone()
@@ -17,17 +17,24 @@ import logging
 import os
 import subprocess
 import platform
-from typing import List, Tuple, Optional
+import threading
+from functools import lru_cache
+from typing import Iterator, List, Tuple, Optional
 
 from hapray.core.common.common_utils import CommonUtils
+from hapray.core.common.node_worker import NodeWorkerError, NodeWorkerPool
+from hapray.core.common.tool_runner import ToolRunner
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
 def _get_trace_streamer_path() -> str:
     """Gets the path to the trace_streamer executable based on the current OS.
 
+    Resolved on first use, so actions that never convert traces do not need the binary.
+
     Returns:
         Path to the trace_streamer executable
 
@@ -79,9 +86,6 @@ class ExeUtils:
         'hapray-cmd.js'
     ))
 
-    # Path to the trace streamer executable
-    trace_streamer_path = _get_trace_streamer_path()
-
     @staticmethod
     def build_hapray_cmd(args: List[str]) -> List[str]:
         """Constructs a command for executing hapray-cmd.js.
@@ -95,47 +99,29 @@ class ExeUtils:
         return ['node', ExeUtils.hapray_cmd_path, 'hapray', *args]
 
     @staticmethod
-    def execute_command(cmd: List[str]) -> Tuple[bool, Optional[str], Optional[str]]:
-        """Executes a shell command and captures its output.
+    def _worker_pool() -> Optional[NodeWorkerPool]:
+        """Returns the pool of persistent hapray workers, or None to run one-shot processes."""
+        return NodeWorkerPool.get_instance(ExeUtils.build_hapray_cmd(['worker']))
+
+    @staticmethod
+    def execute_command(cmd: List[str], timeout: Optional[float] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Tuple[bool, Optional[str], Optional[str]]:
+        """Executes a shell command within the concurrency limit of its tool.
+
+        Output is streamed to the log line by line; only the last lines are returned.
 
         Args:
             cmd: Command to execute as a list of strings
+            timeout: Seconds before the command is killed (default: `tool_runner.timeout`)
+            cancel_event: Kills the command when set
 
         Returns:
             Tuple (success, stdout, stderr)
         """
-        try:
-            result = subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace'
-            )
-
-            # Log output appropriately
-            if result.stdout:
-                logger.debug("Command output [%s]:\n%s", ' '.join(cmd), result.stdout)
-            if result.stderr:
-                logger.warning("Command warnings [%s]:\n%s", ' '.join(cmd), result.stderr)
-
-            logger.info("Command executed successfully: %s", ' '.join(cmd))
-            return True, result.stdout, result.stderr
-
-        except subprocess.CalledProcessError as e:
-            logger.error(
-                "Command failed with code %d: %s\nSTDOUT: %s\nSTDERR: %s",
-                e.returncode,
-                ' '.join(cmd),
-                e.stdout,
-                e.stderr
-            )
-            return False, e.stdout, e.stderr
-
-        except FileNotFoundError:
-            logger.error("Command not found: %s", ' '.join(cmd))
+        result = ToolRunner.get_instance().run(cmd, timeout=timeout, cancel_event=cancel_event)
+        if result.returncode is None:
             return False, None, None
+        return result.success, result.stdout, result.stderr
 
     @staticmethod
     def execute_hapray_cmd(args: List[str]) -> bool:
@@ -147,12 +133,59 @@ class ExeUtils:
         Returns:
             True if execution was successful, False otherwise
         """
+        pool = ExeUtils._worker_pool()
+        if pool:
+            try:
+                success = pool.execute(args)
+                logger.info("Worker command %s: %s", 'succeeded' if success else 'failed', ' '.join(args))
+                return success
+            except NodeWorkerError:
+                # Raised only before the command printed anything, so it is safe to rerun
+                pass
+
         cmd = ExeUtils.build_hapray_cmd(args)
         success, _, _ = ExeUtils.execute_command(cmd)
         return success
 
     @staticmethod
-    def convert_data_to_db(data_file: str, output_db: str) -> bool:
+    def stream_hapray_cmd(args: List[str]) -> Iterator[str]:
+        """Executes a hapray command and yields its output lines as they are printed.
+
+        Args:
+            args: Arguments to pass to the hapray command
+
+        Yields:
+            Lines of stdout and stderr, without the trailing newline
+        """
+        pool = ExeUtils._worker_pool()
+        if pool:
+            try:
+                success = yield from pool.stream(args)
+                logger.info("Worker command %s: %s", 'succeeded' if success else 'failed', ' '.join(args))
+                return
+            except NodeWorkerError:
+                # Raised only before the command printed anything, so it is safe to rerun
+                pass
+
+        cmd = ExeUtils.build_hapray_cmd(args)
+        with ToolRunner.get_instance().slot('node'), subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                errors='replace'
+        ) as process:
+            for line in process.stdout:
+                yield line.rstrip('\n')
+            returncode = process.wait()
+        if returncode != 0:
+            logger.error("Command failed with code %d: %s", returncode, ' '.join(cmd))
+        else:
+            logger.info("Command executed successfully: %s", ' '.join(cmd))
+
+    @staticmethod
+    def convert_data_to_db(data_file: str, output_db: str, so_dir: Optional[str] = None) -> bool:
         """Converts an .htrace file to a SQLite database.
 
         Uses the trace_streamer tool to perform the conversion.
@@ -160,6 +193,7 @@ class ExeUtils:
         Args:
             data_file: Path to input .htrace/.data file
             output_db: Path to output SQLite database
+            so_dir: Directory of symbolicated .so files used to resolve perf.data symbols
 
         Returns:
             True if conversion was successful, False otherwise
@@ -171,11 +205,13 @@ class ExeUtils:
 
             # Prepare conversion command
             cmd = [
-                ExeUtils.trace_streamer_path,
+                _get_trace_streamer_path(),
                 data_file,
                 '-e',
                 output_db
             ]
+            if so_dir:
+                cmd.extend(['--So_dir', so_dir])
 
             logger.info("Converting htrace to DB: %s -> %s", data_file, output_db)
 
@@ -184,6 +220,9 @@ class ExeUtils:
 
             if not success:
                 logger.error("Conversion failed for %s: %s", data_file, stderr)
+                # A partial database would be taken as converted by later steps
+                if os.path.exists(output_db):
+                    os.remove(output_db)
                 return False
 
             # Verify output file was created
@@ -16,37 +16,87 @@ limitations under the License.
 import json
 import os
 import shutil
-from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from xdevice import platform_logger
 
+from hapray.core.config.config import Config
+from hapray.core.step_splitter import SESSION_DIR, STEP_WINDOW_FILE, is_continuous
+
 Log = platform_logger("FolderUtils")
 
-"""
-扫描ResourceUsage_PerformanceDynamic_jingdong_0020_round0/hiperf
-文件夹下是否每个step文件夹下都有perf.data
+# 各步骤数据文件的最小有效大小（字节）与文件头魔数
+MIN_STEP_DATA_SIZE = 4096
+PERF_DATA_MAGIC = b'PERFILE2'
+HTRACE_MAGIC = b'OHOSPROF'
 
-"""
 
+def _check_data_file(path: str, magic: bytes) -> Optional[str]:
+    """检查数据文件是否存在、大小是否合理、文件头是否可解析，返回失败原因，正常时返回None"""
+    if not os.path.isfile(path):
+        return 'missing'
+    size = os.path.getsize(path)
+    if size < MIN_STEP_DATA_SIZE:
+        return f'too small ({size} bytes)'
+    with open(path, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            return 'invalid header'
+    return None
+
+
+def find_incomplete_steps(round_dir: str, check_trace: bool = True) -> Optional[List[int]]:
+    """
+    逐个步骤校验一轮采集的数据（perf.data与trace.htrace）
+
+    参数:
+        round_dir: 轮次目录，如 ResourceUsage_PerformanceDynamic_jingdong_0020_round0
+        check_trace: 是否同时校验trace.htrace
 
-def scan_folders(root_dir):
-    root_dir = Path(root_dir) / 'hiperf'
-    steps_json = read_json_arrays_from_dir(str(root_dir))
+    返回:
+        数据不完整的步骤编号列表；steps.json缺失（整轮失败）或连续采集会话无效时返回None
+    """
+    steps_json = read_json_arrays_from_dir(os.path.join(round_dir, 'hiperf'))
     if len(steps_json) == 0:
-        return False
-    perf_data_num = 0
-    for item in os.listdir(root_dir):
-        item_path = os.path.join(root_dir, item)
-        if os.path.isdir(item_path):
-            if (Path(item_path) / 'perf.data').exists():
-                perf_data_num = perf_data_num + 1
-
-    perf_data_percent = perf_data_num / len(steps_json) * 100
-    if perf_data_percent > 50:
-        return True
-    else:
-        return False
+        return None
+    if is_continuous(round_dir):
+        return _check_session(round_dir, steps_json, check_trace)
+    data_filename = Config.get('hiperf.data_filename', 'perf.data')
+    failed_steps = []
+    for step in steps_json:
+        step_idx = step['stepIdx']
+        checks = [(os.path.join(round_dir, 'hiperf', f'step{step_idx}', data_filename), PERF_DATA_MAGIC)]
+        if check_trace:
+            checks.append((os.path.join(round_dir, 'htrace', f'step{step_idx}', 'trace.htrace'), HTRACE_MAGIC))
+        for path, magic in checks:
+            reason = _check_data_file(path, magic)
+            if reason:
+                Log.info(f"步骤{step_idx}数据无效: {path} {reason}")
+                failed_steps.append(step_idx)
+                break
+    return failed_steps
+
+
+def _check_session(round_dir: str, steps_json: List[Dict[str, Any]], check_trace: bool) -> Optional[List[int]]:
+    """
+    校验连续采集的一轮数据：会话文件有效且每个步骤都有时间窗口标记
+
+    所有步骤共用同一个会话，任一检查失败时整轮需要重新采集，返回None
+    """
+    session_dir = os.path.join(round_dir, SESSION_DIR)
+    checks = [(os.path.join(session_dir, Config.get('hiperf.data_filename', 'perf.data')), PERF_DATA_MAGIC)]
+    if check_trace:
+        checks.append((os.path.join(session_dir, 'trace.htrace'), HTRACE_MAGIC))
+    for path, magic in checks:
+        reason = _check_data_file(path, magic)
+        if reason:
+            Log.info(f"连续采集会话数据无效: {path} {reason}")
+            return None
+    for step in steps_json:
+        marker = os.path.join(round_dir, 'hiperf', f"step{step['stepIdx']}", STEP_WINDOW_FILE)
+        if not os.path.isfile(marker):
+            Log.info(f"步骤{step['stepIdx']}缺少时间窗口标记: {marker}")
+            return None
+    return []
 
 
 def delete_folder(folder_path):
@@ -0,0 +1,259 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Iterator, List, Optional
+
+import psutil
+
+from hapray.core.common.tool_runner import ToolRun, ToolRunner
+from hapray.core.config.config import Config
+
+# Line printed by `hapray worker` after the output of every request
+DONE_PREFIX = '@worker-done '
+DEFAULT_POOL_SIZE = 2
+
+logger = logging.getLogger(__name__)
+
+
+class NodeWorkerError(RuntimeError):
+    """The worker process exited before finishing a request."""
+
+
+class NodeWorkerTimeout(NodeWorkerError):
+    """The worker printed nothing within the timeout and was killed."""
+
+
+class NodeWorker:
+    """One long-lived `hapray worker` process speaking JSON lines over stdin/stdout."""
+
+    def __init__(self, cmd: List[str]):
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace'
+        )
+        self.busy = False
+        self.completed = 0
+        self._ids = itertools.count(1)
+        # stdout is read by a thread, so a hanging worker can be detected with a deadline
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, daemon=True).start()
+        try:
+            self._ps_process = psutil.Process(self.process.pid)
+        except psutil.Error:
+            self._ps_process = None
+
+    def _pump(self):
+        for line in self.process.stdout:
+            self._lines.put(line.rstrip('\n'))
+        self._lines.put(None)
+
+    def cpu_time(self) -> Optional[float]:
+        """CPU time the worker process has used so far."""
+        try:
+            times = self._ps_process.cpu_times()
+            return times.user + times.system
+        except (AttributeError, psutil.Error):
+            return None
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, args: List[str], timeout: Optional[float] = None) -> Iterator[str]:
+        """Send one request and yield its output lines; the return value is the success flag.
+
+        Args:
+            timeout: Seconds the request may run; the worker is killed when it is exceeded
+
+        Raises:
+            NodeWorkerTimeout: If the request is not done within the timeout
+            NodeWorkerError: If the worker exits before the request is done
+        """
+        request_id = next(self._ids)
+        self.busy = True
+        try:
+            self.process.stdin.write(json.dumps({'id': request_id, 'args': args}) + '\n')
+            self.process.stdin.flush()
+        except OSError as e:
+            raise NodeWorkerError(f'Worker is not accepting requests: {e}') from e
+
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+            except queue.Empty:
+                self.process.kill()
+                raise NodeWorkerTimeout(f'Worker request timed out after {timeout}s')
+            if line is None:
+                break
+            if line.startswith(DONE_PREFIX):
+                result = json.loads(line[len(DONE_PREFIX):])
+                if result.get('id') == request_id:
+                    self.busy = False
+                    self.completed += 1
+                    if not result.get('ok'):
+                        logger.error("Worker command failed: %s", result.get('error'))
+                    return bool(result.get('ok'))
+                continue
+            yield line
+        raise NodeWorkerError(f'Worker exited with code {self.process.wait()}')
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class NodeWorkerPool:
+    """Pool of `hapray worker` processes that keep the toolbox loaded between commands.
+
+    Workers are started on demand up to `size`. If a worker cannot be started or dies
+    before ever finishing a request (e.g. an older toolbox without the worker command),
+    the pool marks itself broken and callers fall back to one-shot execution.
+    """
+    _instance = None
+    _instance_pid = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, cmd: List[str], size: int = DEFAULT_POOL_SIZE):
+        self.cmd = cmd
+        self.size = max(1, size)
+        self.broken = False
+        self._idle = queue.LifoQueue()
+        self._workers: List[NodeWorker] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls, cmd: List[str]) -> Optional['NodeWorkerPool']:
+        """Return the pool of this process, or None if workers are disabled or unusable."""
+        if not Config.get('node_worker.enable', True):
+            return None
+        with cls._instance_lock:
+            # Forked children must not share the pipes of their parent's workers
+            if cls._instance is None or cls._instance_pid != os.getpid():
+                cls._instance = NodeWorkerPool(cmd, Config.get('node_worker.pool_size', DEFAULT_POOL_SIZE))
+                cls._instance_pid = os.getpid()
+                atexit.register(cls._instance.close)
+        return None if cls._instance.broken else cls._instance
+
+    def _acquire(self) -> NodeWorker:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if len(self._workers) < self.size:
+                    try:
+                        worker = NodeWorker(self.cmd)
+                    except OSError as e:
+                        self.broken = True
+                        raise NodeWorkerError(f'Failed to start worker: {e}') from e
+                    self._workers.append(worker)
+                    return worker
+            # Re-check periodically, a busy worker may die instead of being released
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def _release(self, worker: NodeWorker):
+        if worker.alive and not worker.busy:
+            self._idle.put(worker)
+            return
+        # A worker abandoned mid-request still has output pending, so it is not reused
+        worker.process.kill()
+        with self._lock:
+            self._workers.remove(worker)
+
+    def stream(self, args: List[str]) -> Iterator[str]:
+        """Run a hapray command on a worker and yield its output lines.
+
+        The request holds a `node` slot of the ToolRunner, is bounded by `tool_runner.timeout`
+        and is recorded in the ToolRunner statistics like a one-shot command. A worker that
+        times out is killed and replaced by a new one on the next request.
+
+        Raises:
+            NodeWorkerError: If the worker failed before printing any output of the command;
+                only then may the caller retry it as a one-shot process
+        """
+        command = ' '.join(args)
+        timeout = Config.get('tool_runner.timeout')
+        runner = ToolRunner.get_instance()
+        with runner.slot('node'):
+            worker = self._acquire()
+            start_time = time.monotonic()
+            start_cpu = worker.cpu_time()
+            success, timed_out, lines = False, False, 0
+            try:
+                requests = worker.run(args, timeout)
+                while True:
+                    try:
+                        line = next(requests)
+                    except StopIteration as stop:
+                        success = bool(stop.value)
+                        break
+                    lines += 1
+                    yield line
+            except NodeWorkerError as e:
+                timed_out = isinstance(e, NodeWorkerTimeout)
+                if worker.completed == 0 and not timed_out:
+                    self.broken = True
+                    logger.warning("Node worker unavailable, falling back to one-shot execution")
+                else:
+                    logger.error("Node worker failed during command: %s (%s)", command, e)
+                # Output already handed to the caller must not be produced twice, and a
+                # command that hung on a worker would hang again
+                if lines == 0 and not timed_out:
+                    raise
+            finally:
+                end_cpu = worker.cpu_time()
+                cpu_time = end_cpu - start_cpu if start_cpu is not None and end_cpu is not None else None
+                self._release(worker)
+                runner.record(ToolRun('node', success, 0 if success else None, '', '',
+                                      time.monotonic() - start_time, cpu_time, timed_out))
+        return success
+
+    def execute(self, args: List[str]) -> bool:
+        """Run a hapray command on a worker, logging its output."""
+        runner = self.stream(args)
+        while True:
+            try:
+                line = next(runner)
+            except StopIteration as stop:
+                return bool(stop.value)
+            logger.debug(line)
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
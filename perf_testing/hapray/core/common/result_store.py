@@ -0,0 +1,139 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from hapray.core.common.cache_utils import get_cache_dir
+from hapray.core.config.config import Config
+
+RESULT_STORE_DB = 'results.db'
+DEFAULT_MAX_SIZE_MB = 1024
+# Stay below the default SQLite host parameter limit
+_QUERY_BATCH = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    kind TEXT,
+    version TEXT,
+    file_hash TEXT,
+    data TEXT,
+    size INTEGER,
+    accessed_at INTEGER,
+    PRIMARY KEY (kind, version, file_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at);
+"""
+
+
+class ResultStore:
+    """Content-addressed store for per-file analysis results.
+
+    Results are keyed by (kind, version, file hash): `kind` names the analyzer (e.g.
+    'flags', 'invoke'), `version` identifies everything else the result depends on (model
+    version, input reports), so a changed analyzer never reuses stale results. Values are
+    stored as JSON in a single SQLite database in WAL mode, which allows concurrent writers
+    from threads and processes. Least recently used entries are evicted once the stored
+    data exceeds `cache.result_store_max_size` MB.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, db_path: Optional[str] = None, max_size_mb: Optional[int] = None):
+        self.db_path = db_path or os.path.join(get_cache_dir(), RESULT_STORE_DB)
+        self.max_size = int(max_size_mb or Config.get('cache.result_store_max_size', DEFAULT_MAX_SIZE_MB)) * 1024 * 1024
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def get_instance(cls) -> 'ResultStore':
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = ResultStore()
+        return cls._instance
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get_many(self, kind: str, version: str, file_hashes: Iterable[str]) -> Dict[str, Any]:
+        """Read the results of many files at once.
+
+        Returns:
+            Mapping of file hash to result for every stored file
+        """
+        unique = list(set(file_hashes))
+        found = {}
+        now = int(time.time())
+        with self._connect() as conn:
+            for i in range(0, len(unique), _QUERY_BATCH):
+                batch = unique[i:i + _QUERY_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f"SELECT file_hash, data FROM results "
+                    f"WHERE kind = ? AND version = ? AND file_hash IN ({placeholders})",
+                    (kind, version, *batch)
+                ).fetchall()
+                for file_hash, data in rows:
+                    found[file_hash] = json.loads(data)
+                if rows:
+                    conn.execute(
+                        f"UPDATE results SET accessed_at = ? "
+                        f"WHERE kind = ? AND version = ? AND file_hash IN ({placeholders})",
+                        (now, kind, version, *batch)
+                    )
+        return found
+
+    def get(self, kind: str, version: str, file_hash: str) -> Optional[Any]:
+        return self.get_many(kind, version, [file_hash]).get(file_hash)
+
+    def put_many(self, kind: str, version: str, results: Dict[str, Any]):
+        """Store results of many files in a single transaction."""
+        if not results:
+            return
+        now = int(time.time())
+        rows = []
+        for file_hash, result in results.items():
+            data = json.dumps(result)
+            rows.append((kind, version, file_hash, data, len(data), now))
+        with self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def put(self, kind: str, version: str, file_hash: str, result: Any):
+        self.put_many(kind, version, {file_hash: result})
+
+    def evict(self):
+        """Drop least recently used results until the store fits into its size limit."""
+        with self._connect() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            if total <= self.max_size:
+                return
+            excess = total - self.max_size
+            removed = 0
+            evicted = []
+            rows = conn.execute('SELECT kind, version, file_hash, size FROM results ORDER BY accessed_at').fetchall()
+            for kind, version, file_hash, size in rows:
+                evicted.append((kind, version, file_hash))
+                removed += size
+                if removed >= excess:
+                    break
+            conn.executemany('DELETE FROM results WHERE kind = ? AND version = ? AND file_hash = ?', evicted)
+        logging.info("Evicted %d cached results (%.1f MB)", len(evicted), removed / 1024 / 1024)
@@ -0,0 +1,246 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import psutil
+
+from hapray.core.config.config import Config
+
+# Estimated peak memory of one process per tool, used to size the concurrency limits
+TOOL_MEMORY_MB = {
+    'trace_streamer': 2048,
+    'node': 1024,
+}
+DEFAULT_TOOL_MEMORY_MB = 512
+# Output lines kept per stream for the result; everything else is only logged
+MAX_TAIL_LINES = 200
+POLL_INTERVAL = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+class ToolRun(NamedTuple):
+    """Outcome and resource usage of one external tool invocation."""
+    tool: str
+    success: bool
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    wall_time: float
+    cpu_time: Optional[float]
+    timed_out: bool = False
+    cancelled: bool = False
+
+
+def tool_name(cmd: List[str]) -> str:
+    """Tool key of a command, e.g. 'trace_streamer' for trace_streamer_linux."""
+    name = os.path.splitext(os.path.basename(cmd[0]))[0]
+    return 'trace_streamer' if name.startswith('trace_streamer') else name
+
+
+def default_tool_limit(tool: str) -> int:
+    """Concurrent processes of a tool that fit into the CPU cores and physical memory."""
+    cores = os.cpu_count() or 1
+    memory_mb = psutil.virtual_memory().total // (1024 * 1024)
+    by_memory = memory_mb // TOOL_MEMORY_MB.get(tool, DEFAULT_TOOL_MEMORY_MB)
+    return max(1, min(cores, by_memory))
+
+
+class ToolRunner:
+    """Runs external tools (trace_streamer, node, ...) with bounded concurrency.
+
+    Every tool has one semaphore per process, shared by all thread pools, sized by
+    `tool_runner.limits.<tool>` or from cores and memory. Output is streamed line by line
+    to the logger instead of being buffered; calls can time out or be cancelled, and wall
+    and CPU time of every invocation are recorded.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.records: List[ToolRun] = []
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._records_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> 'ToolRunner':
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = ToolRunner()
+        return cls._instance
+
+    def _semaphore(self, tool: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if tool not in self._semaphores:
+                limit = Config.get(f'tool_runner.limits.{tool}') or default_tool_limit(tool)
+                logger.debug("Concurrency limit for %s: %d", tool, limit)
+                self._semaphores[tool] = threading.BoundedSemaphore(int(limit))
+            return self._semaphores[tool]
+
+    @contextmanager
+    def slot(self, tool: str) -> Iterator[None]:
+        """Hold one of the concurrency slots of a tool."""
+        semaphore = self._semaphore(tool)
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    @staticmethod
+    def _pump(stream, tail: deque, level: int, prefix: str):
+        for line in stream:
+            line = line.rstrip('\n')
+            tail.append(line)
+            logger.log(level, "[%s] %s", prefix, line)
+
+    @staticmethod
+    def _wait(process: subprocess.Popen, deadline: Optional[float],
+              cancel_event: Optional[threading.Event]) -> dict:
+        """Wait for the process, killing it on timeout or cancellation; returns CPU time and flags."""
+        state = {'cpu_time': None, 'timed_out': False, 'cancelled': False}
+        ps_process = None
+        while True:
+            if hasattr(os, 'wait4'):
+                # Reaping the child ourselves gives its exact resource usage
+                pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    process.returncode = os.waitstatus_to_exitcode(status)
+                    state['cpu_time'] = rusage.ru_utime + rusage.ru_stime
+                    return state
+            else:
+                try:
+                    ps_process = ps_process or psutil.Process(process.pid)
+                    times = ps_process.cpu_times()
+                    state['cpu_time'] = times.user + times.system
+                except psutil.Error:
+                    pass
+                if process.poll() is not None:
+                    return state
+
+            if not state['timed_out'] and not state['cancelled']:
+                if deadline is not None and time.monotonic() > deadline:
+                    state['timed_out'] = True
+                    process.kill()
+                elif cancel_event is not None and cancel_event.is_set():
+                    state['cancelled'] = True
+                    process.kill()
+            time.sleep(POLL_INTERVAL)
+
+    def run(self, cmd: List[str], tool: Optional[str] = None, timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None) -> ToolRun:
+        """Run a command within the concurrency limit of its tool.
+
+        Args:
+            cmd: Command to execute as a list of strings
+            tool: Tool key for the concurrency limit (default: derived from cmd[0])
+            timeout: Seconds before the process is killed (default: `tool_runner.timeout`)
+            cancel_event: Kills the process when set
+
+        Returns:
+            ToolRun with the exit status, the last output lines and the resource usage
+        """
+        tool = tool or tool_name(cmd)
+        if timeout is None:
+            timeout = Config.get('tool_runner.timeout')
+        command = ' '.join(cmd)
+
+        with self.slot(tool):
+            start_time = time.monotonic()
+            try:
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    encoding='utf-8',
+                    errors='replace'
+                )
+            except OSError as e:
+                logger.error("Command not found: %s (%s)", command, e)
+                return ToolRun(tool, False, None, '', str(e), 0.0, None)
+
+            stdout_tail = deque(maxlen=MAX_TAIL_LINES)
+            stderr_tail = deque(maxlen=MAX_TAIL_LINES)
+            readers = [
+                threading.Thread(target=self._pump, args=(process.stdout, stdout_tail, logging.DEBUG, tool),
+                                 daemon=True),
+                threading.Thread(target=self._pump, args=(process.stderr, stderr_tail, logging.WARNING, tool),
+                                 daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+            deadline = time.monotonic() + timeout if timeout else None
+            state = self._wait(process, deadline, cancel_event)
+            # Grandchildren of a killed process may keep the pipes open
+            killed = state['timed_out'] or state['cancelled']
+            for reader in readers:
+                reader.join(5 if killed else None)
+            process.stdout.close()
+            process.stderr.close()
+            wall_time = time.monotonic() - start_time
+
+        result = ToolRun(
+            tool=tool,
+            success=process.returncode == 0 and not state['timed_out'] and not state['cancelled'],
+            returncode=process.returncode,
+            stdout='\n'.join(stdout_tail),
+            stderr='\n'.join(stderr_tail),
+            wall_time=wall_time,
+            cpu_time=state['cpu_time'],
+            timed_out=state['timed_out'],
+            cancelled=state['cancelled'],
+        )
+        self.record(result)
+
+        cpu_time = f"{result.cpu_time:.2f}s" if result.cpu_time is not None else 'n/a'
+        if result.timed_out:
+            logger.error("Command timed out after %.1fs: %s", timeout, command)
+        elif result.cancelled:
+            logger.warning("Command cancelled: %s", command)
+        elif not result.success:
+            logger.error("Command failed with code %d: %s\nSTDERR: %s", process.returncode, command, result.stderr)
+        else:
+            logger.info("Command executed successfully in %.2fs (cpu %s): %s", wall_time, cpu_time, command)
+        return result
+
+    def record(self, result: ToolRun):
+        """Add a tool invocation to the statistics, also for work not started by run()."""
+        with self._records_lock:
+            self.records.append(result)
+
+    def log_summary(self):
+        for tool, total in sorted(self.summary().items()):
+            logger.info("%s: %d runs, wall %.1fs, cpu %.1fs", tool, total['count'], total['wall_time'],
+                        total['cpu_time'])
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Invocation count, wall time and CPU time per tool."""
+        totals = {}
+        with self._records_lock:
+            for record in self.records:
+                total = totals.setdefault(record.tool, {'count': 0, 'wall_time': 0.0, 'cpu_time': 0.0})
+                total['count'] += 1
+                total['wall_time'] += record.wall_time
+                total['cpu_time'] += record.cpu_time or 0.0
+        return totals
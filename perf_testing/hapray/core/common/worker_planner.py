@@ -0,0 +1,85 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import os
+from typing import NamedTuple, Tuple
+
+import psutil
+
+# hapray elf processes running alongside the detection at most
+MAX_INVOKE_WORKERS = 4
+# The LSTM graph is a single chain of ops, more inter-op threads only add contention
+INTER_OP_THREADS = 1
+
+
+class WorkerPlan(NamedTuple):
+    """Division of the available cores between processes and TensorFlow threads."""
+    logical_cores: int
+    physical_cores: int
+    extract_workers: int
+    intra_op_threads: int
+    inter_op_threads: int
+    invoke_workers: int
+
+    def describe(self) -> str:
+        return (f"{self.logical_cores} logical / {self.physical_cores} physical cores: "
+                f"{self.extract_workers} extraction workers, inference with {self.intra_op_threads} intra-op "
+                f"and {self.inter_op_threads} inter-op threads, {self.invoke_workers} invoke workers")
+
+
+def available_cores() -> Tuple[int, int]:
+    """Return (logical, physical) cores this process may run on, honouring CPU affinity."""
+    try:
+        logical = len(os.sched_getaffinity(0))
+    except AttributeError:
+        logical = os.cpu_count() or 1
+    total_logical = psutil.cpu_count(logical=True) or logical
+    total_physical = psutil.cpu_count(logical=False) or total_logical
+    # Scale physical cores down when the affinity mask covers only part of the machine
+    physical = max(1, min(logical, total_physical * logical // total_logical))
+    return logical, physical
+
+
+def plan_workers(jobs: int, with_invoke: bool = False) -> WorkerPlan:
+    """Plan how the opt pipeline uses the cores, so its processes do not oversubscribe them.
+
+    One core is left to the main process. Invoke analysis, when it runs concurrently,
+    gets a quarter of the cores. Extraction workers take up to half of the rest, capped
+    by `jobs`; inference threads get the remaining cores, at most one per physical core
+    since the model is compute bound and does not profit from hyper-threads.
+
+    Args:
+        jobs: Requested parallel jobs (opt -j)
+        with_invoke: Whether hapray elf invoke analysis runs at the same time
+
+    Returns:
+        WorkerPlan
+    """
+    logical, physical = available_cores()
+    remaining = max(1, logical - 1) if logical > 2 else logical
+
+    invoke_workers = 0
+    if with_invoke:
+        invoke_workers = min(MAX_INVOKE_WORKERS, max(1, remaining // 4))
+        remaining = max(1, remaining - invoke_workers)
+
+    extract_workers = min(jobs, max(1, remaining // 2)) if jobs > 1 else 1
+    compute_cores = max(1, remaining - extract_workers) if extract_workers > 1 else remaining
+    intra_op_threads = max(1, min(compute_cores, physical))
+
+    plan = WorkerPlan(logical, physical, extract_workers, intra_op_threads, INTER_OP_THREADS, invoke_workers)
+    logging.info("Worker plan: %s", plan.describe())
+    return plan
@@ -0,0 +1,159 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import multiprocessing
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
+
+from hapray.core.config.config import Config
+
+# Settings PerfAction changes at runtime, forwarded to device processes
+FORWARDED_CONFIG_KEYS = ('run_testcases', 'so_dir', 'trace.enable', 'hiperf.event', 'capture.continuous',
+                         'capture.profile')
+# Steps PerfTestCase captures; the other steps only run their actions
+CAPTURE_STEPS_KEY = 'capture_steps'
+HDC_TIMEOUT = 30
+
+
+class RoundTask(NamedTuple):
+    """One round of a test case."""
+    case_name: str
+    case_dir: str
+    round_num: int
+
+    @property
+    def name(self) -> str:
+        return f'{self.case_name}_round{self.round_num}'
+
+
+def list_devices() -> List[str]:
+    """Serial numbers of the devices connected via hdc."""
+    try:
+        result = subprocess.run(['hdc', 'list', 'targets'], capture_output=True, text=True, timeout=HDC_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.error("Failed to list devices: %s", e)
+        return []
+    return [line.strip() for line in result.stdout.splitlines() if line.strip() and line.strip() != '[Empty]']
+
+
+class DeviceDriver(ABC):
+    """Runs one round of a test case on a device."""
+
+    @abstractmethod
+    def run_case(self, task: RoundTask, output: str, device_sn: Optional[str],
+                 capture_steps: Optional[List[int]] = None):
+        """Run the round; with capture_steps only those steps are captured again into output."""
+        pass
+
+
+def _run_xdevice(command: str, config_path: Optional[str], overrides: Dict):
+    """Entry of a device process: restore the configuration of the parent and run xdevice."""
+    Config(config_path)
+    for key, value in overrides.items():
+        Config.set(key, value)
+    from xdevice.__main__ import main_process
+    main_process(command)
+
+
+class XDeviceDriver(DeviceDriver):
+    """Runs test cases with xdevice.
+
+    With several devices every round runs in its own process, since xdevice keeps global
+    state per run; a single device runs in-process as before.
+    """
+
+    def __init__(self, isolated: bool = False):
+        self.isolated = isolated
+
+    def run_case(self, task: RoundTask, output: str, device_sn: Optional[str],
+                 capture_steps: Optional[List[int]] = None):
+        command = f'run -l {task.case_name} -tcpath {task.case_dir} -rp {output}'
+        if device_sn:
+            command += f' -sn {device_sn}'
+        if not self.isolated:
+            from xdevice.__main__ import main_process
+            Config.set(CAPTURE_STEPS_KEY, capture_steps)
+            try:
+                main_process(command)
+            finally:
+                Config.set(CAPTURE_STEPS_KEY, None)
+            return
+
+        overrides = {key: Config.get(key) for key in FORWARDED_CONFIG_KEYS}
+        overrides[CAPTURE_STEPS_KEY] = capture_steps
+        process = multiprocessing.get_context('spawn').Process(
+            target=_run_xdevice, args=(command, Config().user_config_path, overrides))
+        process.start()
+        process.join()
+        if process.exitcode:
+            logging.error("xdevice exited with code %s on %s: %s", process.exitcode, device_sn, command)
+
+
+class DeviceScheduler:
+    """Shards test case rounds across devices.
+
+    Every device has its own queue. Cases are spread round-robin, with all rounds of a
+    case queued on the same device; a device whose queue runs empty steals rounds from
+    the tail of the longest queue, so no device idles while others still have work.
+    """
+
+    def __init__(self, devices: List[Optional[str]]):
+        self.devices = devices
+        self.queues: Dict[Optional[str], Deque[RoundTask]] = {device: deque() for device in devices}
+        self._lock = threading.Lock()
+
+    def assign(self, tasks: List[RoundTask]):
+        cases = list(dict.fromkeys(task.case_name for task in tasks))
+        for task in tasks:
+            device = self.devices[cases.index(task.case_name) % len(self.devices)]
+            self.queues[device].append(task)
+
+    def next_task(self, device: Optional[str]) -> Optional[RoundTask]:
+        with self._lock:
+            if self.queues[device]:
+                return self.queues[device].popleft()
+            victim = max(self.queues, key=lambda other: len(self.queues[other]))
+            if self.queues[victim]:
+                task = self.queues[victim].pop()
+                logging.info("Device %s takes over %s from %s", device, task.name, victim)
+                return task
+        return None
+
+    def run(self, run_task: Callable[[RoundTask, Optional[str]], None]):
+        """Run all assigned tasks with one worker thread per device; returns when all are done."""
+
+        def worker(device: Optional[str]):
+            while True:
+                task = self.next_task(device)
+                if task is None:
+                    return
+                try:
+                    run_task(task, device)
+                except Exception as e:
+                    logging.exception("Round %s failed on device %s: %s", task.name, device, e)
+
+        if len(self.devices) == 1:
+            worker(self.devices[0])
+            return
+        threads = [threading.Thread(target=worker, args=(device,), name=f'device-{device}')
+                   for device in self.devices]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
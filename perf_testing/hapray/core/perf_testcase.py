@@ -23,18 +23,30 @@ from devicetest.core.test_case import TestCase
 from hypium import UiDriver
 from xdevice import platform_logger
 
+from hapray.core.capture_profile import get_capture_profile
 from hapray.core.config.config import Config
+from hapray.core.step_splitter import SESSION_DIR, write_step_markers
+from hapray.core.transfer_manager import TransferManager
 
 Log = platform_logger("PerfTestCase")
 
-# Template for basic performance collection command
+# Device output of the continuous capture session of a test case
+_SESSION_OUTPUT_PATH = "/data/local/tmp/hiperf_session.data"
+# Upper bound of a continuous session; it is stopped when the test case generates its reports
+_DEFAULT_SESSION_MAX_DURATION = 1800
+_COLLECTOR_START_TIMEOUT = 10
+# Time the capture continues after the step action returned (seconds)
+_DEFAULT_CAPTURE_TAIL = 1
+
+# Template for basic performance collection command; sampling settings come from the capture profile
 _PERF_CMD_TEMPLATE = (
-    '{cmd} {pids} --call-stack dwarf --kernel-callchain -f 1000 '
+    '{cmd} {pids} --call-stack {call_stack} --kernel-callchain -f {frequency} '
     '--cpu-limit 100 -e {event} --enable-debuginfo-symbolic '
-    '--clockid boottime -m 1024 -d {duration} {output_path}'
+    '--clockid boottime -m {mmap_pages} -d {duration} {output_path}'
 )
 
-# Template for combined trace and performance collection command
+# Template for combined trace and performance collection command; events, categories and buffers come
+# from the capture profile
 _TRACE_PERF_CMD_TEMPLATE = """hiprofiler_cmd \\
   -c - \\
   -o {output_path}.htrace \\
@@ -46,7 +58,7 @@ _TRACE_PERF_CMD_TEMPLATE = """hiprofiler_cmd \\
  request_id: 1
  session_config {{
   buffers {{
-   pages: 16384
+   pages: {buffer_pages}
   }}
  }}
 
@@ -56,47 +68,13 @@ _TRACE_PERF_CMD_TEMPLATE = """hiprofiler_cmd \\
   sample_interval: 1000
   config_data {{
    # ftrace events
-   ftrace_events: "sched/sched_switch"
-   ftrace_events: "power/suspend_resume"
-   ftrace_events: "sched/sched_wakeup"
-   ftrace_events: "sched/sched_wakeup_new"
-   ftrace_events: "sched/sched_waking"
-   ftrace_events: "sched/sched_process_exit"
-   ftrace_events: "sched/sched_process_free"
-   ftrace_events: "task/task_newtask"
-   ftrace_events: "task/task_rename"
-   ftrace_events: "power/cpu_frequency"
-   ftrace_events: "power/cpu_idle"
+{ftrace_events}
 
    # hitrace categories
-   hitrace_categories: "ability"
-   hitrace_categories: "ace"
-   hitrace_categories: "app"
-   hitrace_categories: "ark"
-   hitrace_categories: "binder"
-   hitrace_categories: "disk"
-   hitrace_categories: "freq"
-   hitrace_categories: "graphic"
-   hitrace_categories: "idle"
-   hitrace_categories: "irq"
-   hitrace_categories: "memreclaim"
-   hitrace_categories: "mmc"
-   hitrace_categories: "multimodalinput"
-   hitrace_categories: "notification"
-   hitrace_categories: "ohos"
-   hitrace_categories: "pagecache"
-   hitrace_categories: "rpc"
-   hitrace_categories: "sched"
-   hitrace_categories: "sync"
-   hitrace_categories: "window"
-   hitrace_categories: "workq"
-   hitrace_categories: "zaudio"
-   hitrace_categories: "zcamera"
-   hitrace_categories: "zimage"
-   hitrace_categories: "zmedia"
+{hitrace_categories}
 
    # Buffer configuration
-   buffer_size_kb: 204800
+   buffer_size_kb: {buffer_size_kb}
    flush_interval_ms: 1000
    flush_threshold_kb: 4096
    parse_ksyms: true
@@ -126,6 +104,9 @@ class PerfTestCase(TestCase, ABC):
         self.driver = UiDriver(self.device1)
         self.TAG = tag
         self._start_app_package = None  # Package name for process identification
+        self.transfers = TransferManager(self.driver)  # Background device-to-host transfers of all steps
+        self._session_thread = None  # Collection thread of the continuous capture session
+        self._step_windows = []  # Captured window of every step (within the session in continuous mode)
 
     @property
     @abstractmethod
@@ -166,6 +147,19 @@ class PerfTestCase(TestCase, ABC):
             duration: Data collection time in seconds
             sample_all_processes: Whether to sample all system processes
         """
+        if Config.get('capture.continuous'):
+            if Config.get('capture_steps'):
+                Log.warning('Continuous capture records all steps in one session, re-capturing the whole round')
+            self._execute_continuous_step(step_id, action, duration, sample_all_processes)
+            return
+
+        capture_steps = Config.get('capture_steps')
+        if capture_steps and step_id not in capture_steps:
+            # Re-capture of failed steps: the data of this step is kept, only its action runs
+            Log.info(f'Step {step_id} already captured, running action only')
+            action(self.driver)
+            return
+
         output_file = self._prepare_output_path(step_id)
         self._clean_previous_output(output_file)
 
@@ -180,15 +174,153 @@ class PerfTestCase(TestCase, ABC):
             args=(cmd, duration)
         )
         collection_thread.start()
+        early_stop = Config.get('capture.early_stop', False)
+        # With early stop the captured window starts once the collector runs (which may take seconds
+        # with hiprofiler_cmd), so it covers the action and the stop reaches a running collector
+        if early_stop and not self._wait_for_collector():
+            Log.warning(f'Collector of step {step_id} not running after {_COLLECTOR_START_TIMEOUT}s')
+        start_ns, host_start_ns = self._get_device_boottime_ns(), time.time_ns()
 
         # Execute the test action while data collection runs
         action(self.driver)
 
+        if early_stop:
+            # Stop sampling idle time once the action is done, `duration` is only the upper bound
+            time.sleep(float(Config.get('capture.tail', _DEFAULT_CAPTURE_TAIL)))
+            if collection_thread.is_alive() and not self._stop_collection():
+                Log.warning(f'Early stop of step {step_id} could not be delivered, capturing the full {duration}s')
         collection_thread.join()
-        self._save_performance_data_async(output_file, step_id)
+        self._record_step_window(step_id, start_ns, self._get_device_boottime_ns(), host_start_ns, time.time_ns())
+        self.transfers.submit(self._save_perf_and_trace_data, output_file, step_id)
+
+    def _execute_continuous_step(self, step_id: int, action: callable, duration: int, sample_all_processes: bool):
+        """
+        Execute a test step within the continuous capture session of the test case
+
+        The session is started by the first step and recorded in one piece; the step only
+        marks its window with the device boottime (the clock of the captured data) and the
+        host time, which the host uses to split the session into per-step data. The session
+        samples all processes, since the app may start processes after it began; each step
+        keeps only its app processes (pids.json) unless sample_all_processes is set.
+        """
+        if self._session_thread is None:
+            self._start_session()
+
+        perf_step_dir = os.path.join(self.report_path, 'hiperf', f'step{step_id}')
+        self._ensure_directories_exist(perf_step_dir)
+        self._save_process_info(perf_step_dir)
+
+        start_ns, host_start_ns = self._get_device_boottime_ns(), time.time_ns()
+        action(self.driver)
+        if Config.get('capture.early_stop', False):
+            time.sleep(float(Config.get('capture.tail', _DEFAULT_CAPTURE_TAIL)))
+        else:
+            # Keep the window as long as a step captured on its own
+            remaining = duration - (time.time_ns() - host_start_ns) / 1e9
+            if remaining > 0:
+                time.sleep(remaining)
+        self._record_step_window(step_id, start_ns, self._get_device_boottime_ns(), host_start_ns, time.time_ns(),
+                                 sample_all=sample_all_processes)
+
+    def _record_step_window(self, step_id: int, start_ns: int, end_ns: int, host_start_ns: int, host_end_ns: int,
+                            **extra):
+        """Remember the window a step was captured in, in device boottime and host time"""
+        self._step_windows.append({
+            'stepIdx': step_id,
+            'start_ns': start_ns,
+            'end_ns': end_ns,
+            'host_start_ns': host_start_ns,
+            'host_end_ns': host_end_ns,
+            **extra
+        })
+        Log.info(f'Step {step_id} captured for {(end_ns - start_ns) / 1e9:.2f}s')
+
+    def _start_session(self):
+        """Start the continuous capture session of all processes and wait until the collector runs"""
+        self._clean_previous_output(_SESSION_OUTPUT_PATH)
+        duration = int(Config.get('capture.session_max_duration', _DEFAULT_SESSION_MAX_DURATION))
+        cmd = self._build_collection_command(_SESSION_OUTPUT_PATH, duration, True)
+        self._session_thread = threading.Thread(target=self._run_perf_command, args=(cmd, duration))
+        self._session_thread.start()
+        if not self._wait_for_collector():
+            Log.warning(f'Continuous capture session not running after {_COLLECTOR_START_TIMEOUT}s')
+
+    def _wait_for_collector(self) -> bool:
+        """Wait until the collector process runs; False if it did not start in time"""
+        start_time = time.time()
+        deadline = start_time + _COLLECTOR_START_TIMEOUT
+        while time.time() < deadline:
+            if self._get_collector_pids():
+                Log.info(f'Collector running after {time.time() - start_time:.1f}s')
+                return True
+            time.sleep(0.2)
+        return False
+
+    def _finish_session(self) -> bool:
+        """Stop the continuous capture session and save its data with the step windows"""
+        if self._session_thread.is_alive() and not self._stop_collection():
+            Log.warning('Continuous capture session could not be stopped, waiting for its maximum duration')
+        self._session_thread.join()
+        self._session_thread = None
+
+        session_dir = os.path.join(self.report_path, SESSION_DIR)
+        self._ensure_directories_exist(session_dir)
+        if not self._verify_remote_files_exist(_SESSION_OUTPUT_PATH):
+            return False
+        pulls = [self.transfers.pull(_SESSION_OUTPUT_PATH,
+                                     os.path.join(session_dir, Config.get('hiperf.data_filename', 'perf.data')))]
+        if Config.get('trace.enable'):
+            pulls.append(self.transfers.pull(f"{_SESSION_OUTPUT_PATH}.htrace",
+                                             os.path.join(session_dir, 'trace.htrace')))
+        results = [pull.result() for pull in pulls]
+        if not all(results):
+            return False
+        write_step_markers(self.report_path, self._step_windows)
+        return True
+
+    def _get_collector_pids(self) -> list[int]:
+        """PIDs of the running collector (hiprofiler_cmd with trace, hiperf record otherwise)"""
+        collector = 'hiprofiler_cmd' if Config.get('trace.enable') else 'hiperf record'
+        result = self.driver.shell(f"ps -ef | grep '{collector}'")
+
+        pids = []
+        for line in result.splitlines():
+            parts = line.split()
+            # Skip the grep process itself and `hiperf report` runs of previous steps
+            if 'grep' in line or len(parts) < 2 or not parts[1].isdigit():
+                continue
+            pids.append(int(parts[1]))
+        return pids
+
+    def _stop_collection(self) -> bool:
+        """Stop the running collector; SIGINT lets it flush and close its output files
+
+        Returns:
+            False if no collector process was found to stop
+        """
+        pids = self._get_collector_pids()
+        if not pids:
+            return False
+        self.driver.shell(f"kill -2 {' '.join(map(str, pids))}")
+        return True
+
+    def _get_device_boottime_ns(self) -> int:
+        """Current boottime of the device in nanoseconds"""
+        result = self.driver.shell("cat /proc/uptime")
+        try:
+            return int(float(result.split()[0]) * 1e9)
+        except (ValueError, IndexError):
+            Log.error(f"Failed to read device boottime: {result}")
+            return 0
 
     def generate_reports(self):
         """Generate test reports and metadata files"""
+        if self._session_thread is not None and not self._finish_session():
+            Log.error("Continuous capture session could not be saved completely")
+        # Steps are transferred in the background, reports must only see complete files;
+        # xdevice runs many cases in one process, so the transfer threads are released here
+        if not self.transfers.close():
+            Log.error("Some performance data could not be transferred completely")
         steps_info = self._collect_step_information()
         self._save_steps_info(steps_info)
         self._save_test_metadata()
@@ -239,9 +371,13 @@ class PerfTestCase(TestCase, ABC):
             output_arg: str = ''
     ) -> str:
         """Construct base performance collection command"""
+        profile = get_capture_profile()
         return _PERF_CMD_TEMPLATE.format(
             cmd=cmd,
             pids=pids,
+            call_stack=profile.call_stack,
+            frequency=profile.frequency,
+            mmap_pages=profile.mmap_pages,
             output_path=output_arg,
             duration=duration,
             event=Config.get('hiperf.event')
@@ -254,9 +390,15 @@ class PerfTestCase(TestCase, ABC):
             record_args: str
     ) -> str:
         """Construct combined trace and performance command"""
+        profile = get_capture_profile()
         return _TRACE_PERF_CMD_TEMPLATE.format(
             output_path=output_path,
             duration=duration,
+            buffer_pages=profile.buffer_pages,
+            ftrace_events='\n'.join(f'   ftrace_events: "{event}"' for event in profile.ftrace_events),
+            hitrace_categories='\n'.join(f'   hitrace_categories: "{category}"'
+                                          for category in profile.hitrace_categories),
+            buffer_size_kb=profile.buffer_size_kb,
             record_args=record_args
         )
 
@@ -266,14 +408,8 @@ class PerfTestCase(TestCase, ABC):
         self.driver.shell(command, timeout=duration + 30)
         Log.info('Performance collection completed')
 
-    def _save_performance_data_async(self, device_file: str, step_id: int):
-        """Asynchronously save collected performance data"""
-        threading.Thread(
-            target=lambda: self._save_perf_and_trace_data(device_file, step_id)
-        ).start()
-
-    def _save_perf_and_trace_data(self, device_file: str, step_id: int):
-        """Save performance and trace data to report directory"""
+    def _save_perf_and_trace_data(self, device_file: str, step_id: int) -> bool:
+        """Save performance and trace data to report directory, pulling all files concurrently"""
         perf_step_dir = os.path.join(
             self.report_path,
             'hiperf',
@@ -295,23 +431,46 @@ class PerfTestCase(TestCase, ABC):
         self._save_process_info(perf_step_dir)
 
         if not self._verify_remote_files_exist(device_file):
-            return
+            return False
 
-        self._transfer_perf_data(device_file, local_perf_path)
+        pulls = [self.transfers.pull(device_file, local_perf_path)]
         if Config.get('trace.enable'):
-            self._transfer_trace_data(device_file, local_trace_path)
+            pulls.append(self.transfers.pull(f"{device_file}.htrace", local_trace_path))
+        # perf.json is generated on the device while the raw data is being pulled
+        self.driver.shell(f"hiperf report -i {device_file} --json -o {device_file}.json")
+        pulls.append(self.transfers.pull(f"{device_file}.json", os.path.join(perf_step_dir, 'perf.json')))
+        results = [pull.result() for pull in pulls]
+        return all(results)
 
     def _collect_step_information(self) -> list:
-        """Collect metadata about test steps"""
+        """Collect metadata about test steps, including the window each step was captured in"""
+        windows = self._load_previous_step_windows()
+        for window in self._step_windows:
+            windows[window['stepIdx']] = {key: value for key, value in window.items() if key != 'stepIdx'}
+
         step_info = []
         for idx, step in enumerate(self.steps, start=1):
-            step_info.append({
+            info = {
                 "name": step['name'],
                 "description": step['description'],
                 "stepIdx": idx
-            })
+            }
+            if idx in windows:
+                info["captureWindow"] = windows[idx]
+            step_info.append(info)
         return step_info
 
+    def _load_previous_step_windows(self) -> dict:
+        """Capture windows of an earlier run of this round, kept for steps that were not captured again"""
+        steps_path = os.path.join(self.report_path, 'hiperf', 'steps.json')
+        if not os.path.exists(steps_path):
+            return {}
+        try:
+            with open(steps_path, 'r', encoding='utf-8') as file:
+                return {step['stepIdx']: step['captureWindow'] for step in json.load(file) if 'captureWindow' in step}
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return {}
+
     def _save_steps_info(self, steps_info: list):
         """Save step metadata to JSON file"""
         steps_path = os.path.join(self.report_path, 'hiperf', 'steps.json')
@@ -403,21 +562,3 @@ class PerfTestCase(TestCase, ABC):
                 return False
 
         return True
-
-    def _transfer_perf_data(self, remote_path: str, local_path: str):
-        """Transfer performance data from device to host"""
-        self.driver.shell(f"hiperf report -i {remote_path} --json -o {remote_path}.json")
-        self.driver.pull_file(remote_path, local_path)
-        self.driver.pull_file(f"{remote_path}.json", os.path.join(os.path.dirname(local_path), 'perf.json'))
-        if os.path.exists(local_path):
-            Log.info(f"Performance data saved: {local_path}")
-        else:
-            Log.error(f"Failed to transfer performance data: {local_path}")
-
-    def _transfer_trace_data(self, remote_path: str, local_path: str):
-        """Transfer trace data from device to host"""
-        self.driver.pull_file(f"{remote_path}.htrace", local_path)
-        if os.path.exists(local_path):
-            Log.info(f"Trace data saved: {local_path}")
-        else:
-            Log.error(f"Failed to transfer trace data: {local_path}")
@@ -0,0 +1,101 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from hapray.core.common.exe_utils import ExeUtils
+from hapray.core.config.config import Config
+from hapray.core.step_splitter import is_continuous, split_session_perf
+
+DEFAULT_QUEUE_SIZE = 2
+DEFAULT_WORKERS = 2
+
+
+def prepare_round(round_dir: str) -> bool:
+    """Convert the perf data of one round into the databases round selection reads.
+
+    Steps whose databases already exist are skipped, so `dbtools --choose` only reads
+    them. Trace data is left alone: only the selected round is analyzed, and its traces
+    are converted then. A round captured in one continuous session is split into its
+    steps first.
+
+    Returns:
+        True if every step of the round was converted
+    """
+    data_filename = Config.get('hiperf.data_filename', 'perf.data')
+    db_filename = Config.get('hiperf.db_filename', 'perf.db')
+    so_dir = Config.get('so_dir', None)
+    success = split_session_perf(round_dir) if is_continuous(round_dir) else True
+
+    hiperf_dir = os.path.join(round_dir, 'hiperf')
+    if os.path.isdir(hiperf_dir):
+        for step_dir in sorted(os.listdir(hiperf_dir)):
+            data_file = os.path.join(hiperf_dir, step_dir, data_filename)
+            db_file = os.path.join(hiperf_dir, step_dir, db_filename)
+            if os.path.exists(data_file) and not os.path.exists(db_file):
+                success &= ExeUtils.convert_data_to_db(data_file, db_file, so_dir)
+
+    logging.info("Round data %s: %s", 'converted' if success else 'partially converted', round_dir)
+    return success
+
+
+class RoundPipeline:
+    """Converts the perf data of finished rounds on the host while the device captures the next ones.
+
+    Each round handed to `submit` is converted by a small thread pool. At most
+    `pipeline.queue_size` rounds may wait for conversion; once the host falls that far
+    behind, `submit` blocks and capturing pauses until a conversion finishes.
+    """
+
+    def __init__(self, queue_size: Optional[int] = None, workers: Optional[int] = None):
+        self.enabled = bool(Config.get('pipeline.enable', True))
+        self.workers = max(1, int(workers or Config.get('pipeline.workers', DEFAULT_WORKERS)))
+        queue_size = max(0, int(queue_size if queue_size is not None
+                                else Config.get('pipeline.queue_size', DEFAULT_QUEUE_SIZE)))
+        self._slots = threading.BoundedSemaphore(self.workers + queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix='round-pipeline') if self.enabled else None
+
+    def __enter__(self) -> 'RoundPipeline':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, round_dir: str) -> Optional[Future]:
+        """Queue a finished round for conversion, blocking while the queue is full.
+
+        Returns:
+            Future of prepare_round(), or None if the pipeline is disabled
+        """
+        if not self.enabled:
+            return None
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(prepare_round, round_dir)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self):
+        """Wait for all queued conversions."""
+        if self._executor:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,228 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from hapray.core.common.exe_utils import ExeUtils
+from hapray.core.config.config import Config
+
+# Continuous capture layout of a round: <round>/session/{perf.data, trace.htrace, step_windows.json}
+SESSION_DIR = 'session'
+STEP_WINDOWS_FILE = 'step_windows.json'
+# Marker of a step captured within a session: its window, and the session dir relative to the scene
+STEP_WINDOW_FILE = 'step_window.json'
+HTRACE_FILENAME = 'trace.htrace'
+TRACE_DB_FILENAME = 'trace.db'
+# Time column of perf samples in the clock of the trace (boottime)
+_PERF_SAMPLE_TIME_COLUMN = 'timestamp_trace'
+# Columns of counter tables (e.g. measure): a value holds from its ts until the next one of its filter
+_COUNTER_COLUMNS = ('ts', 'value', 'filter_id')
+
+# Steps of one session are analyzed in parallel, the session database is converted once
+_session_locks: Dict[str, threading.Lock] = {}
+_session_locks_guard = threading.Lock()
+
+
+def is_continuous(round_dir: str) -> bool:
+    """Whether a round was recorded as one continuous session."""
+    return os.path.exists(os.path.join(round_dir, SESSION_DIR, STEP_WINDOWS_FILE))
+
+
+def load_step_windows(round_dir: str) -> List[Dict]:
+    with open(os.path.join(round_dir, SESSION_DIR, STEP_WINDOWS_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_step_marker(step_dir: str) -> Optional[Dict]:
+    """Window marker of a hiperf step dir, None if the step was captured on its own."""
+    marker_path = os.path.join(step_dir, STEP_WINDOW_FILE)
+    if not os.path.exists(marker_path):
+        return None
+    with open(marker_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_step_markers(round_dir: str, windows: List[Dict]):
+    """Record the step windows of a session, once for the round and as a small marker per step.
+
+    The raw session data stays in <round>/session/ only; step dirs hold the marker and,
+    once split, their own perf.db.
+    """
+    with open(os.path.join(round_dir, SESSION_DIR, STEP_WINDOWS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(windows, f, indent=4)
+    for window in windows:
+        step_dir = os.path.join(round_dir, 'hiperf', f"step{window['stepIdx']}")
+        os.makedirs(step_dir, exist_ok=True)
+        with open(os.path.join(step_dir, STEP_WINDOW_FILE), 'w', encoding='utf-8') as f:
+            json.dump(dict(window, session=SESSION_DIR), f, indent=4)
+
+
+def _load_step_pids(step_dir: str) -> Optional[List[int]]:
+    pids_path = os.path.join(step_dir, 'pids.json')
+    if not os.path.exists(pids_path):
+        return None
+    with open(pids_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('pids') or None
+
+
+def _time_filter(columns: List[str], start: int, end: int, time_column: str, alias: str = '') -> Optional[str]:
+    """Condition matching the rows outside the window [start, end], None if the table has no time column"""
+    if time_column not in columns:
+        return None
+    if 'dur' in columns and time_column == 'ts':
+        # Slices are kept when they overlap the window; unfinished slices have a negative dur
+        return f"{alias}ts > {end} OR {alias}ts + MAX(COALESCE({alias}dur, 0), 0) < {start}"
+    return f"{alias}{time_column} < {start} OR {alias}{time_column} > {end}"
+
+
+def write_step_view(session_db: str, step_db: str, start: int, end: int, pids: Optional[List[int]] = None):
+    """Write a new database with the rows of a session database within the time window [start, end] (ns).
+
+    The session database is attached and only the rows of the window are
+    inserted, so a step costs I/O in the size of its own data. Tables without a time
+    column are copied whole; counter tables also keep the last value of every counter
+    before the window, which still holds at its start.
+
+    Args:
+        pids: Processes to keep perf samples of; the session samples all processes, since
+            the app may start new processes after the session began
+    """
+    os.makedirs(os.path.dirname(step_db), exist_ok=True)
+    temp_db = f'{step_db}.tmp'
+    if os.path.exists(temp_db):
+        os.remove(temp_db)
+    conn = sqlite3.connect(temp_db)
+    try:
+        conn.execute('ATTACH DATABASE ? AS src', (session_db,))
+        schema = conn.execute("SELECT type, name, sql FROM src.sqlite_master WHERE sql IS NOT NULL "
+                              "AND name NOT LIKE 'sqlite_%'").fetchall()
+        tables = [name for kind, name, _ in schema if kind == 'table']
+        for kind, _, sql in schema:
+            if kind == 'table':
+                conn.execute(sql)
+
+        for table in tables:
+            columns = [row[1] for row in conn.execute(f'PRAGMA src.table_info("{table}")')]
+            time_column = _PERF_SAMPLE_TIME_COLUMN if table == 'perf_sample' else 'ts'
+            outside = _time_filter(columns, start, end, time_column)
+            conditions = [f'NOT COALESCE(({outside}), 0)'] if outside else []
+            params = []
+            if pids and table == 'perf_sample' and 'perf_thread' in tables:
+                placeholders = ','.join('?' * len(pids))
+                conditions.append(f"thread_id IN (SELECT thread_id FROM src.perf_thread "
+                                  f"WHERE process_id IN ({placeholders}))")
+                params = pids
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+            conn.execute(f'INSERT INTO main."{table}" SELECT * FROM src."{table}"{where}', params)
+
+            if outside and all(column in columns for column in _COUNTER_COLUMNS):
+                # Last value before the window of every counter, unless already inserted above
+                counter_outside = _time_filter(columns, start, end, time_column, 's.')
+                conn.execute(f'INSERT INTO main."{table}" SELECT s.* FROM src."{table}" AS s '
+                             f'JOIN (SELECT filter_id, MAX(ts) AS ts FROM src."{table}" WHERE ts < {start} '
+                             f'GROUP BY filter_id) AS last ON s.filter_id = last.filter_id AND s.ts = last.ts '
+                             f'WHERE COALESCE(({counter_outside}), 0)')
+
+        if 'trace_range' in tables:
+            conn.execute(f"UPDATE trace_range SET start_ts = MAX(start_ts, {start}), end_ts = MIN(end_ts, {end})")
+        # Indexes are built once over the inserted rows
+        for kind, _, sql in schema:
+            if kind != 'table':
+                conn.execute(sql)
+        conn.commit()
+        conn.execute('DETACH DATABASE src')
+    finally:
+        conn.close()
+    os.replace(temp_db, step_db)
+
+
+def _ensure_session_db(session_data: str, session_db: str, so_dir: Optional[str]) -> bool:
+    with _session_locks_guard:
+        lock = _session_locks.setdefault(session_db, threading.Lock())
+    with lock:
+        return os.path.exists(session_db) or ExeUtils.convert_data_to_db(session_data, session_db, so_dir)
+
+
+def split_session_perf(round_dir: str) -> bool:
+    """Convert the session perf data of a continuous round and split it into per-step databases.
+
+    Every step gets hiperf/step<N>/perf.db holding only the samples of its window and of
+    the app processes recorded for the step, so round selection and analyzers keep working
+    per step. Existing step databases are kept.
+
+    Returns:
+        True if all step databases exist afterwards
+    """
+    data_filename = Config.get('hiperf.data_filename', 'perf.data')
+    db_filename = Config.get('hiperf.db_filename', 'perf.db')
+    session_data = os.path.join(round_dir, SESSION_DIR, data_filename)
+    session_db = os.path.join(round_dir, SESSION_DIR, db_filename)
+    windows = load_step_windows(round_dir)
+
+    pending = [window for window in windows
+               if not os.path.exists(os.path.join(round_dir, 'hiperf', f"step{window['stepIdx']}", db_filename))]
+    if not pending:
+        return True
+    if not _ensure_session_db(session_data, session_db, Config.get('so_dir', None)):
+        return False
+
+    success = True
+    for window in pending:
+        step_dir = os.path.join(round_dir, 'hiperf', f"step{window['stepIdx']}")
+        pids = None if window.get('sample_all') else _load_step_pids(step_dir)
+        try:
+            write_step_view(session_db, os.path.join(step_dir, db_filename),
+                            window['start_ns'], window['end_ns'], pids)
+        except sqlite3.Error as e:
+            logging.error("Failed to split %s for step %s: %s", session_db, window['stepIdx'], e)
+            success = False
+    logging.info("Split continuous perf data of %s into %d steps", round_dir, len(pending))
+    return success
+
+
+def prepare_step_trace(scene_dir: str, step_dir_name: str) -> Optional[str]:
+    """Write the trace database of a step captured within a session.
+
+    Trace data is split lazily, only for the steps that are analyzed: the step marker
+    names the session its window belongs to, which may be the session of any round
+    after round selection.
+
+    Returns:
+        Path of htrace/<step>/trace.db, None if the step was not captured within a session
+    """
+    marker = load_step_marker(os.path.join(scene_dir, 'hiperf', step_dir_name))
+    if marker is None:
+        return None
+    trace_db = os.path.join(scene_dir, 'htrace', step_dir_name, TRACE_DB_FILENAME)
+    if os.path.exists(trace_db):
+        return trace_db
+
+    session_dir = os.path.join(scene_dir, marker.get('session', SESSION_DIR))
+    session_data = os.path.join(session_dir, HTRACE_FILENAME)
+    session_db = os.path.join(session_dir, TRACE_DB_FILENAME)
+    if not os.path.exists(session_data) or not _ensure_session_db(session_data, session_db, None):
+        logging.error("No session trace for %s in %s", step_dir_name, session_dir)
+        return None
+    try:
+        write_step_view(session_db, trace_db, marker['start_ns'], marker['end_ns'])
+    except sqlite3.Error as e:
+        logging.error("Failed to split %s for %s: %s", session_db, step_dir_name, e)
+        return None
+    return trace_db
@@ -0,0 +1,143 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from xdevice import platform_logger
+
+from hapray.core.config.config import Config
+
+DEFAULT_WORKERS = 3
+DEFAULT_RETRIES = 2
+
+Log = platform_logger("TransferManager")
+
+
+class TransferManager:
+    """Tracks and runs device-to-host transfers of a test case.
+
+    Step jobs (on-device post-processing followed by pulls) run in the background while
+    the test continues; the files they pull are transferred concurrently by a separate
+    pool of `transfer.workers` threads. Files can be gzip-compressed on the device
+    (`transfer.compress`) and are decompressed on the host; every file is verified against
+    its size on the device and pulled again on mismatch. `wait` blocks until all
+    submitted work is done, so reports are never generated from truncated files.
+    """
+
+    def __init__(self, driver, workers: Optional[int] = None, compress: Optional[bool] = None):
+        self.driver = driver
+        workers = max(1, int(workers or Config.get('transfer.workers', DEFAULT_WORKERS)))
+        self.compress = bool(Config.get('transfer.compress', False) if compress is None else compress)
+        self.retries = int(Config.get('transfer.retries', DEFAULT_RETRIES))
+        self._jobs = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='transfer-job')
+        self._pulls = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='transfer-pull')
+        self._pending: List[Future] = []
+        self._lock = threading.Lock()
+
+    def submit(self, job: Callable, *args) -> Future:
+        """Run a transfer job in the background and track it until `wait`."""
+        future = self._jobs.submit(job, *args)
+        with self._lock:
+            self._pending.append(future)
+        return future
+
+    def pull(self, remote_path: str, local_path: str) -> Future:
+        """Pull a file concurrently with other transfers; the future resolves to True on success."""
+        return self._pulls.submit(self._pull_file, remote_path, local_path)
+
+    def wait(self) -> bool:
+        """Block until every submitted job has finished.
+
+        Returns:
+            True if all jobs succeeded
+        """
+        success = True
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return success
+            for future in pending:
+                try:
+                    if future.result() is False:
+                        success = False
+                except Exception as e:
+                    Log.error(f"Transfer failed: {e}")
+                    success = False
+
+    def close(self) -> bool:
+        """Wait for all submitted jobs and release the transfer threads.
+
+        Returns:
+            True if all jobs succeeded
+        """
+        success = self.wait()
+        self._jobs.shutdown(wait=True)
+        self._pulls.shutdown(wait=True)
+        return success
+
+    def remote_size(self, remote_path: str) -> Optional[int]:
+        """Size of a file on the device, None if it does not exist or cannot be read."""
+        result = self.driver.shell(f"stat -c %s {remote_path}")
+        try:
+            return int(result.strip().splitlines()[-1])
+        except (ValueError, IndexError, AttributeError):
+            return None
+
+    def _pull_file(self, remote_path: str, local_path: str) -> bool:
+        expected_size = self.remote_size(remote_path)
+        if expected_size is None:
+            Log.error(f"Remote file missing: {remote_path}")
+            return False
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+
+        for attempt in range(self.retries + 1):
+            if not (self.compress and self._pull_compressed(remote_path, local_path)):
+                self.driver.pull_file(remote_path, local_path)
+            local_size = os.path.getsize(local_path) if os.path.exists(local_path) else None
+            if local_size == expected_size:
+                Log.info(f"Transferred {remote_path} -> {local_path} ({local_size} bytes)")
+                return True
+            Log.warning(f"Size mismatch for {local_path}: expected {expected_size}, got {local_size} "
+                        f"(attempt {attempt + 1}/{self.retries + 1})")
+        Log.error(f"Failed to transfer {remote_path}")
+        return False
+
+    def _pull_compressed(self, remote_path: str, local_path: str) -> bool:
+        """Gzip the file on the device, pull and decompress it; False if the device cannot compress."""
+        remote_gz = f'{remote_path}.gz'
+        local_gz = f'{local_path}.gz'
+        try:
+            self.driver.shell(f"gzip -c -1 {remote_path} > {remote_gz}")
+            if not self.remote_size(remote_gz):
+                Log.warning(f"On-device compression unavailable, pulling {remote_path} uncompressed")
+                self.compress = False
+                return False
+            self.driver.pull_file(remote_gz, local_gz)
+            with gzip.open(local_gz, 'rb') as src, open(local_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            return True
+        except (OSError, EOFError) as e:
+            Log.warning(f"Compressed transfer of {remote_path} failed: {e}")
+            return False
+        finally:
+            self.driver.shell(f"rm -f {remote_gz}")
+            if os.path.exists(local_gz):
+                os.remove(local_gz)
@@ -0,0 +1,127 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from hapray.core.common.cache_utils import get_cache_dir
+from hapray.core.config.config import Config
+
+CHUNK_CACHE_DB = 'chunk_predictions.db'
+DEFAULT_MAX_ENTRIES = 10_000_000
+# Stay below the default SQLite host parameter limit
+_QUERY_BATCH = 900
+
+_SCHEMA = """
+DROP TABLE IF EXISTS chunk_predictions;
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    version TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    model_id INTEGER REFERENCES models (id),
+    hash BLOB,
+    prediction INTEGER,
+    confidence REAL,
+    accessed_at INTEGER,
+    PRIMARY KEY (model_id, hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_chunks_accessed ON chunks (accessed_at);
+"""
+
+
+class ChunkPredictionCache:
+    """Persistent cache of chunk content hash -> (prediction, confidence).
+
+    Statically linked runtimes, padding and shared third-party code produce identical
+    2048-byte chunks across libraries and app versions; those are predicted only once.
+    Entries are scoped by model version so a new model never reuses stale predictions;
+    versions are stored once in the models table and referenced by id. Least recently
+    used entries are evicted once the cache holds more than `cache.chunk_cache_max_entries`.
+    """
+
+    def __init__(self, model_version: str, db_path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.model_version = model_version
+        self.db_path = db_path or os.path.join(get_cache_dir(), CHUNK_CACHE_DB)
+        self.max_entries = int(max_entries or Config.get('cache.chunk_cache_max_entries', DEFAULT_MAX_ENTRIES))
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(self.db_path, timeout=60)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute('INSERT OR IGNORE INTO models (version) VALUES (?)', (model_version,))
+        self.model_id = self._conn.execute('SELECT id FROM models WHERE version = ?', (model_version,)).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def hash_chunks(chunks: np.ndarray) -> List[bytes]:
+        chunks = np.ascontiguousarray(chunks)
+        return [hashlib.blake2b(chunk, digest_size=16).digest() for chunk in chunks]
+
+    def get_many(self, hashes: Iterable[bytes]) -> Dict[bytes, Tuple[int, float]]:
+        unique = list(set(hashes))
+        found = {}
+        now = int(time.time())
+        with self._conn:
+            for i in range(0, len(unique), _QUERY_BATCH):
+                batch = unique[i:i + _QUERY_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, prediction, confidence FROM chunks "
+                    f"WHERE model_id = ? AND hash IN ({placeholders})",
+                    (self.model_id, *batch)
+                ).fetchall()
+                for chunk_hash, prediction, confidence in rows:
+                    found[chunk_hash] = (prediction, confidence)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE chunks SET accessed_at = ? WHERE model_id = ? AND hash IN ({placeholders})",
+                        (now, self.model_id, *batch)
+                    )
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[bytes, Tuple[int, float]]):
+        now = int(time.time())
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)',
+                [(self.model_id, chunk_hash, int(pred), float(conf), now)
+                 for chunk_hash, (pred, conf) in entries.items()]
+            )
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits into its entry limit."""
+        total = self._conn.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+        if total <= self.max_entries:
+            return
+        # Entries are dropped by whole access seconds, up to the one of the last excess entry
+        cutoff = self._conn.execute('SELECT accessed_at FROM chunks ORDER BY accessed_at LIMIT 1 OFFSET ?',
+                                    (total - self.max_entries - 1,)).fetchone()[0]
+        with self._conn:
+            removed = self._conn.execute('DELETE FROM chunks WHERE accessed_at <= ?', (cutoff,)).rowcount
+            self._conn.execute('DELETE FROM models WHERE id NOT IN (SELECT DISTINCT model_id FROM chunks) '
+                               'AND id != ?', (self.model_id,))
+        logging.info("Evicted %d cached chunk predictions", removed)
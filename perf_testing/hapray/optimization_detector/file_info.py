@@ -14,24 +14,36 @@ limitations under the License.
 """
 
 import hashlib
+import io
 import logging
 import os
 import shutil
 import tempfile
+import threading
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 import arpy
+import numpy as np
 from elftools.elf.elffile import ELFFile
 
+from hapray.core.common.elf_index import ElfIndex, HASH_BLOCK_SIZE
+
 # File analysis status mapping
 FILE_STATUS_MAPPING = {
     'analyzed': 'Successfully Analyzed',
     'skipped': 'Skipped (System Library)',
+    'cold': 'Skipped (Cold Library)',
     'failed': 'Analysis Failed',
 }
 
+# Larger HAP members are extracted to disk instead of being kept in memory
+HAP_MEMBER_MEMORY_LIMIT = 256 * 1024 * 1024
+# Total size of HAP members kept in memory; further members are extracted to disk
+HAP_MEMORY_BUDGET = 1024 * 1024 * 1024
+
 
 class FileType(Enum):
     SO = 1
@@ -40,22 +52,49 @@ class FileType(Enum):
 
 
 class FileInfo:
-    """Represents information about a binary file"""
+    """Represents information about a binary file
+
+    Size, hash and type are computed on first access and cached, so collecting thousands
+    of files does not read them; FileCollector hashes them in a parallel pre-pass.
+    """
     TEXT_SECTION = '.text'
-    CACHE_DIR = 'files_results_cache'
+    __slots__ = ('absolute_path', 'logical_path', 'data', '_file_size', '_file_hash', '_file_type')
 
-    def __init__(self, absolute_path: str, logical_path: Optional[str] = None):
+    def __init__(self, absolute_path: str, logical_path: Optional[str] = None, data: Optional[bytes] = None):
         self.absolute_path = absolute_path
         self.logical_path = logical_path or absolute_path
-        self.file_size = self._get_file_size()
-        self.file_hash = self._calculate_file_hash()
-        self.file_id = self._generate_file_id()
-        if absolute_path.endswith('.a'):
-            self.file_type = FileType.AR
-        elif absolute_path.endswith('.so'):
-            self.file_type = FileType.SO
-        else:
-            self.file_type = FileType.NOT_SUPPORT
+        # Content of an archive member kept in memory, written to absolute_path only on demand
+        self.data = data
+        self._file_size = None
+        self._file_hash = None
+        self._file_type = None
+
+    @property
+    def file_size(self) -> int:
+        if self._file_size is None:
+            self._file_size = self._get_file_size()
+        return self._file_size
+
+    @property
+    def file_hash(self) -> str:
+        if self._file_hash is None:
+            self._file_hash = self._calculate_file_hash()
+        return self._file_hash
+
+    @property
+    def file_id(self) -> str:
+        return self._generate_file_id()
+
+    @property
+    def file_type(self) -> FileType:
+        if self._file_type is None:
+            if self.absolute_path.endswith('.a'):
+                self._file_type = FileType.AR
+            elif self.absolute_path.endswith('.so'):
+                self._file_type = FileType.SO
+            else:
+                self._file_type = FileType.NOT_SUPPORT
+        return self._file_type
 
     def __repr__(self) -> str:
         return f"FileInfo({self.logical_path}, size={self.file_size}, hash={self.file_hash[:8]}...)"
@@ -69,44 +108,117 @@ class FileInfo:
             'file_id': self.file_id
         }
 
-    def extract_dot_text(self) -> List[int]:
-        """Extract .text segment data"""
+    def extract_dot_text(self, align: int = 1) -> np.ndarray:
+        """Extract .text segment data as a flat uint8 array.
+
+        Args:
+            align: The result is zero-padded to a multiple of this size, so callers can
+                reshape it into fixed-size chunks without another copy
+        """
         if self.file_type == FileType.SO:
-            return self._extract_so_dot_text(self.absolute_path)
+            if self.data is not None:
+                return self._extract_buffer_dot_text(align)
+            return self._extract_so_dot_text(self.absolute_path, align)
         elif self.file_type == FileType.AR:
-            return self._extract_archive_dot_text()
-        return []
+            return self._extract_archive_dot_text(align)
+        return np.empty(0, dtype=np.uint8)
+
+    @staticmethod
+    def _alloc_text_buffer(size: int, align: int) -> np.ndarray:
+        return np.zeros(-(-size // align) * align, dtype=np.uint8)
+
+    def _extract_so_dot_text(self, file_path, align: int = 1) -> np.ndarray:
+        try:
+            # Section layout from the persistent ELF index avoids a full ELF parse
+            section = ElfIndex.get_instance().get_section(file_path, self.TEXT_SECTION)
+            if section:
+                offset, size, _ = section
+                buffer = self._alloc_text_buffer(size, align)
+                with open(file_path, 'rb') as f:
+                    f.seek(offset)
+                    # Read straight into the padded buffer, no intermediate bytes object
+                    if f.readinto(memoryview(buffer)[:size]) == size:
+                        return buffer
+        except Exception as e:
+            logging.debug("ELF index lookup failed for %s: %s", file_path, e)
 
-    def _extract_so_dot_text(self, file_path) -> List[int]:
         try:
             with open(file_path, 'rb') as f:
                 elf = ELFFile(f)
                 section = elf.get_section_by_name(self.TEXT_SECTION)
                 if section:
-                    return list(section.data())
+                    data = section.data()
+                    buffer = self._alloc_text_buffer(len(data), align)
+                    buffer[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+                    return buffer
         except Exception as e:
             logging.error("Failed to extract .text section from %s: %s", file_path, e)
-        return []
+        return np.empty(0, dtype=np.uint8)
 
-    def _extract_archive_dot_text(self) -> List[int]:
-        text_data = []
+    def _extract_buffer_dot_text(self, align: int = 1) -> np.ndarray:
+        return self.text_to_array(self.dot_text_slice(), align)
+
+    def dot_text_slice(self) -> memoryview:
+        """Return the .text section of an in-memory member as a view into its buffer"""
+        try:
+            section = ELFFile(io.BytesIO(self.data)).get_section_by_name(self.TEXT_SECTION)
+            if section:
+                offset, size = section['sh_offset'], section['sh_size']
+                return memoryview(self.data)[offset:offset + size]
+        except Exception as e:
+            logging.error("Failed to extract .text section from %s: %s", self.logical_path, e)
+        return memoryview(b'')
+
+    @classmethod
+    def text_to_array(cls, text, align: int = 1) -> np.ndarray:
+        """Copy raw .text bytes into a flat uint8 array zero-padded to a multiple of align"""
+        buffer = cls._alloc_text_buffer(len(text), align)
+        buffer[:len(text)] = np.frombuffer(text, dtype=np.uint8)
+        return buffer
+
+    def _extract_archive_dot_text(self, align: int = 1) -> np.ndarray:
+        sections = []
         try:
             ar = arpy.Archive(self.absolute_path)
             for name in ar.namelist():
                 elf = ELFFile(ar.open(name))
                 section = elf.get_section_by_name(self.TEXT_SECTION)
                 if section:
-                    text_data.extend(list(section.data()))
+                    sections.append(section.data())
         except Exception as e:
             logging.error("Failed to extract archive file %s: %s", self.absolute_path, e)
-        return text_data
+
+        # Concatenate member sections into one preallocated buffer
+        buffer = self._alloc_text_buffer(sum(len(data) for data in sections), align)
+        offset = 0
+        for data in sections:
+            buffer[offset:offset + len(data)] = np.frombuffer(data, dtype=np.uint8)
+            offset += len(data)
+        return buffer
+
+    def ensure_on_disk(self) -> str:
+        """Return absolute_path, writing in-memory content there first (for external tools)"""
+        if self.data is not None and not os.path.exists(self.absolute_path):
+            os.makedirs(os.path.dirname(self.absolute_path), exist_ok=True)
+            tmp_path = f'{self.absolute_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(self.data)
+            os.replace(tmp_path, self.absolute_path)
+        return self.absolute_path
 
     def _get_file_size(self) -> int:
+        if self.data is not None:
+            return len(self.data)
         return os.path.getsize(self.absolute_path)
 
     def _calculate_file_hash(self) -> str:
+        if self.data is not None:
+            return hashlib.md5(self.data).hexdigest()
+        md5 = hashlib.md5()
         with open(self.absolute_path, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                md5.update(block)
+        return md5.hexdigest()
 
     def _generate_file_id(self) -> str:
         base_name = os.path.basename(self.absolute_path).replace(' ', '_')
@@ -115,15 +227,23 @@ class FileInfo:
 
 
 class FileCollector:
-    def __init__(self):
+    def __init__(self, memory_budget: int = HAP_MEMORY_BUDGET):
         self.temp_dirs = []
+        # HAP member bytes kept in memory so far, bounded by memory_budget
+        self.memory_budget = memory_budget
+        self.memory_used = 0
 
     def cleanup(self):
         for temp_dir in self.temp_dirs:
             shutil.rmtree(temp_dir, ignore_errors=True)
 
-    def collect_binary_files(self, input_path: str) -> List[FileInfo]:
-        """Collect binary files for analysis"""
+    def collect_binary_files(self, input_path: str, workers: int = 1) -> List[FileInfo]:
+        """Collect binary files for analysis
+
+        Args:
+            input_path: Binary file, HAP/HSP or directory
+            workers: Number of threads hashing the collected files
+        """
         file_infos = []
         if os.path.isfile(input_path):
             if input_path.endswith(('.so', '.a')):
@@ -139,26 +259,67 @@ class FileCollector:
                         file_infos.append(FileInfo(file_path, logical_path))
                     elif file.endswith(('.hap', '.hsp')):
                         file_infos.extend(self._extract_hap_file(file_path))
+        self.compute_hashes(file_infos, workers)
+        self._share_duplicates(file_infos)
         return file_infos
 
+    @staticmethod
+    def compute_hashes(file_infos: List[FileInfo], workers: int = 1):
+        """Hash files up front; hashlib releases the GIL, so threads hash in parallel"""
+        if workers > 1 and len(file_infos) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda file_info: file_info.file_hash, file_infos))
+        else:
+            for file_info in file_infos:
+                _ = file_info.file_hash
+
+    @staticmethod
+    def group_by_hash(file_infos: List[FileInfo]) -> Dict[str, List[FileInfo]]:
+        """Group files by content hash, keeping collection order inside each group"""
+        groups = {}
+        for file_info in file_infos:
+            groups.setdefault(file_info.file_hash, []).append(file_info)
+        return groups
+
+    def _share_duplicates(self, file_infos: List[FileInfo]):
+        """Let identical HAP members share one buffer; analyzers process each hash once"""
+        groups = self.group_by_hash(file_infos)
+        for group in groups.values():
+            data = next((file_info.data for file_info in group if file_info.data is not None), None)
+            for file_info in group:
+                if file_info.data is not None:
+                    file_info.data = data
+        if len(groups) < len(file_infos):
+            logging.info("Collected %d binary files, %d unique", len(file_infos), len(groups))
+
     def _extract_hap_file(self, hap_path: str) -> List[FileInfo]:
-        """Extract SO files from HAP/HSP archives and return FileInfo objects"""
+        """Read SO files from HAP/HSP archives and return FileInfo objects
+
+        Members are read once into memory, hashed and parsed from that buffer; they are
+        only written to the temporary directory when an external tool needs a path.
+        Members larger than HAP_MEMBER_MEMORY_LIMIT, and all members once the collected
+        ones exceed memory_budget, are extracted to disk right away.
+        """
         extracted_files = []
         temp_dir = tempfile.mkdtemp()
         self.temp_dirs.append(temp_dir)
 
         try:
             with zipfile.ZipFile(hap_path, 'r') as zip_ref:
-                for file in zip_ref.namelist():
+                for member in zip_ref.infolist():
+                    file = member.filename
                     if file.startswith('libs/arm64') and file.endswith('.so'):
                         output_path = os.path.join(temp_dir, file[5:])
-                        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                        with zip_ref.open(file) as src, open(output_path, 'wb') as dest:
-                            dest.write(src.read())
-                        file_info = FileInfo(
-                            absolute_path=output_path,
-                            logical_path=f"{hap_path}/{file}"
-                        )
+                        logical_path = f"{hap_path}/{file}"
+                        if (member.file_size <= HAP_MEMBER_MEMORY_LIMIT
+                                and self.memory_used + member.file_size <= self.memory_budget):
+                            file_info = FileInfo(output_path, logical_path, zip_ref.read(member))
+                            self.memory_used += member.file_size
+                        else:
+                            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                            with zip_ref.open(member) as src, open(output_path, 'wb') as dest:
+                                shutil.copyfileobj(src, dest)
+                            file_info = FileInfo(output_path, logical_path)
                         extracted_files.append(file_info)
         except Exception as e:
             logging.error("Failed to extract HAP file %s: %s", hap_path, e)
@@ -0,0 +1,120 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from hapray.optimization_detector.file_info import FileInfo
+
+# Sampled event_count per library, attributed to the leaf frame of every callchain
+_LIBRARY_LOAD_SQL = """
+SELECT f.path, SUM(s.event_count)
+FROM perf_sample s
+JOIN (
+    SELECT callchain_id, file_id, MAX(depth)
+    FROM perf_callchain
+    GROUP BY callchain_id
+) c ON s.callchain_id = c.callchain_id
+JOIN (
+    SELECT file_id, path
+    FROM perf_files
+    GROUP BY file_id
+) f ON c.file_id = f.file_id
+GROUP BY f.path
+"""
+
+
+def find_perf_dbs(report_dir: str) -> List[str]:
+    """Find the step perf.db files of a report, skipping per-round copies (as `hapray elf` does)."""
+    perf_dbs = []
+    for root, _, files in os.walk(report_dir):
+        hiperf = os.path.dirname(root)
+        if os.path.basename(hiperf) != 'hiperf' or re.match(r'.*_round\d$', os.path.basename(os.path.dirname(hiperf))):
+            continue
+        perf_dbs.extend(os.path.join(root, file) for file in files if file.endswith('.db'))
+    return sorted(perf_dbs)
+
+
+def library_loads(report_dir: str) -> Dict[str, int]:
+    """Sum the sampled event_count of every library over all perf.db files of a report.
+
+    Returns:
+        Mapping of library file name to event_count
+    """
+    loads = {}
+    for perf_db in find_perf_dbs(report_dir):
+        try:
+            with sqlite3.connect(perf_db) as conn:
+                for path, event_count in conn.execute(_LIBRARY_LOAD_SQL):
+                    if path and event_count:
+                        name = os.path.basename(path)
+                        loads[name] = loads.get(name, 0) + int(event_count)
+        except sqlite3.Error as e:
+            logging.error("Failed to read library loads from %s: %s", perf_db, e)
+    return loads
+
+
+def select_hot_files(file_infos: List[FileInfo], loads: Dict[str, int], min_load: Optional[float] = None,
+                     top_k: Optional[int] = None) -> Tuple[List[FileInfo], List[FileInfo], pd.DataFrame]:
+    """Split files into hot ones worth analyzing and cold ones to skip.
+
+    Args:
+        file_infos: Collected binary files
+        loads: Library load from library_loads()
+        min_load: Minimum share of the total sampled load, in percent
+        top_k: Keep only the K libraries with the highest load
+
+    Returns:
+        Tuple (hot files, cold files, load ranking of all collected libraries)
+    """
+    total_load = sum(loads.values())
+    names = sorted({os.path.basename(file_info.absolute_path) for file_info in file_infos},
+                   key=lambda name: loads.get(name, 0), reverse=True)
+
+    hot_names = set()
+    ranking = []
+    for rank, name in enumerate(names, 1):
+        load = loads.get(name, 0)
+        percentage = load * 100 / total_load if total_load else 0.0
+        hot = load > 0
+        if min_load is not None and percentage < min_load:
+            hot = False
+        if top_k is not None and rank > top_k:
+            hot = False
+        if hot:
+            hot_names.add(name)
+        ranking.append({
+            'Rank': rank,
+            'Library': name,
+            'Event Count': load,
+            'Load (%)': round(percentage, 3),
+            'Analyzed': 'Yes' if hot else 'No',
+        })
+
+    hot_files = []
+    cold_files = []
+    for file_info in file_infos:
+        if os.path.basename(file_info.absolute_path) in hot_names:
+            hot_files.append(file_info)
+        else:
+            cold_files.append(file_info)
+    logging.info("Selected %d hot libraries (%d files), skipping %d cold files",
+                 len(hot_names), len(hot_files), len(cold_files))
+    return hot_files, cold_files, pd.DataFrame(ranking)
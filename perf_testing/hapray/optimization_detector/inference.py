@@ -0,0 +1,263 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+from collections import deque
+from importlib.resources import files
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Rows per model invocation, shared by all files in the batch
+INFERENCE_BATCH_SIZE = 4096
+FEATURES = 2048
+KERAS_MODEL = 'models/aarch64-flag-lstm-converted.h5'
+TFLITE_MODEL = 'models/aarch64-flag-lstm-converted.tflite'
+PARITY_TOLERANCE = 1e-3
+
+
+def _model_path(name: str) -> str:
+    return str(files('hapray.optimization_detector').joinpath(name))
+
+
+def model_version() -> str:
+    """Content hash of the Keras model, identifying predictions made by this model."""
+    md5 = hashlib.md5()
+    with open(_model_path(KERAS_MODEL), 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def _import_tflite_interpreter():
+    """Return the lightest available TFLite Interpreter class, or None."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        import tensorflow as tf
+        return tf.lite.Interpreter
+    except ImportError:
+        return None
+
+
+class KerasBackend:
+    """Runs the original Keras model through TensorFlow."""
+    name = 'keras'
+
+    def __init__(self, model_path: Optional[str] = None, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        import tensorflow as tf
+        # Thread pools can only be sized before TensorFlow runs its first op (0 = TF default)
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        except RuntimeError as e:
+            logging.debug("TensorFlow threading already initialized: %s", e)
+        self.model = tf.keras.models.load_model(model_path or _model_path(KERAS_MODEL))
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.predict(batch, batch_size=256, verbose=0)
+
+
+class TFLiteBackend:
+    """Runs the converted TFLite model, avoiding the Keras startup and per-call overhead."""
+    name = 'tflite'
+
+    def __init__(self, model_path: Optional[str] = None, intra_op_threads: int = 0):
+        interpreter_class = _import_tflite_interpreter()
+        if interpreter_class is None:
+            raise ImportError('No TFLite interpreter available')
+        self.interpreter = interpreter_class(model_path=model_path or _model_path(TFLITE_MODEL),
+                                             num_threads=intra_op_threads or None)
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_rows = None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Tensors are only reallocated when the batch size changes (at most for the last batch)
+        if self._batch_rows != len(batch):
+            self.interpreter.resize_tensor_input(self._input['index'], [len(batch), *batch.shape[1:]])
+            self.interpreter.allocate_tensors()
+            self._batch_rows = len(batch)
+        self.interpreter.set_tensor(self._input['index'], batch.astype(self._input['dtype'], copy=False))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output['index']).copy()
+
+
+def load_backend(backend: str = 'auto', intra_op_threads: int = 0, inter_op_threads: int = 0):
+    """Load an inference backend for the optimization-flag model.
+
+    Args:
+        backend: 'keras', 'tflite' or 'auto' (TFLite when the converted model and an
+            interpreter are available, Keras otherwise)
+        intra_op_threads: Threads used inside one op (0 = runtime default)
+        inter_op_threads: Ops run concurrently (0 = runtime default, Keras only)
+    """
+    if backend in ('auto', 'tflite') and os.path.exists(_model_path(TFLITE_MODEL)):
+        try:
+            return TFLiteBackend(intra_op_threads=intra_op_threads)
+        except Exception as e:
+            if backend == 'tflite':
+                raise
+            logging.info("TFLite backend unavailable, falling back to Keras: %s", e)
+    elif backend == 'tflite':
+        raise FileNotFoundError(f"Converted model not found: {_model_path(TFLITE_MODEL)}")
+    return KerasBackend(intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+
+
+def check_parity(reference, candidate, samples: np.ndarray, tolerance: float = PARITY_TOLERANCE) -> float:
+    """Compare the outputs of two backends on sample chunks.
+
+    Returns:
+        Maximum absolute output difference
+
+    Raises:
+        ValueError: If outputs differ by more than tolerance or predicted classes disagree
+    """
+    expected = reference.predict(samples)
+    actual = candidate.predict(samples)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    mismatches = int(np.sum(np.argmax(expected, axis=1) != np.argmax(actual, axis=1)))
+    if max_diff > tolerance or mismatches:
+        raise ValueError(f"Backend outputs differ: max diff {max_diff:.6f}, {mismatches} class mismatches")
+    return max_diff
+
+
+def _sample_chunks(sample_files: List[str], count: int = 256) -> np.ndarray:
+    """Sample chunks from real binaries, padded with random and zero chunks."""
+    from hapray.optimization_detector.file_info import FileInfo
+
+    chunks = []
+    for path in sample_files:
+        data = FileInfo(path).extract_dot_text(FEATURES)
+        if data.size:
+            chunks.append(data.reshape(-1, FEATURES)[:count])
+    rng = np.random.default_rng(0)
+    chunks.append(rng.integers(0, 256, size=(16, FEATURES), dtype=np.uint8))
+    chunks.append(np.zeros((1, FEATURES), dtype=np.uint8))
+    return np.concatenate(chunks)[:count]
+
+
+def convert_model(output_path: Optional[str] = None, sample_files: Optional[List[str]] = None) -> str:
+    """Convert the Keras model to TFLite and keep it only if it matches the Keras outputs."""
+    import tensorflow as tf
+
+    output_path = output_path or _model_path(TFLITE_MODEL)
+    keras_backend = KerasBackend()
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_backend.model)
+    tmp_path = f'{output_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(converter.convert())
+
+    try:
+        max_diff = check_parity(keras_backend, TFLiteBackend(tmp_path), _sample_chunks(sample_files or []))
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    logging.info("Converted model saved to %s (max output diff %.6f)", output_path, max_diff)
+    return output_path
+
+
+class ChunkBatcher:
+    """Groups feature chunks of many files into fixed-size inference batches.
+
+    Small libraries contribute only a few chunks each, so predicting them one file at a
+    time produces tiny batches. The batcher concatenates chunks across files, runs the
+    model once per full batch and hands back predictions per file as soon as all chunks
+    of a file have been predicted.
+    """
+
+    def __init__(self, predict: Callable[[np.ndarray], np.ndarray], batch_size: int = INFERENCE_BATCH_SIZE):
+        self._predict = predict
+        self.batch_size = batch_size
+        self._segments = deque()  # [file_id, chunks, next row]
+        self._buffered = 0
+        self._outputs: Dict[str, List[np.ndarray]] = {}
+        self._remaining: Dict[str, int] = {}
+
+    def add(self, file_id: str, chunks: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+        """Queue the chunks of a file and run every batch that is full.
+
+        Returns:
+            List of (file_id, predictions) for files whose chunks are all predicted
+        """
+        if len(chunks) == 0:
+            return [(file_id, np.empty((0,), dtype=np.float32))]
+
+        self._outputs[file_id] = []
+        self._remaining[file_id] = len(chunks)
+        self._segments.append([file_id, chunks, 0])
+        self._buffered += len(chunks)
+
+        done = []
+        while self._buffered >= self.batch_size:
+            done.extend(self._run_batch(self.batch_size))
+        return done
+
+    def flush(self) -> List[Tuple[str, np.ndarray]]:
+        """Predict all queued chunks, including the last partial batch."""
+        done = []
+        while self._buffered:
+            done.extend(self._run_batch(min(self._buffered, self.batch_size)))
+        return done
+
+    def _run_batch(self, rows: int) -> List[Tuple[str, np.ndarray]]:
+        parts = []
+        owners = []
+        while rows:
+            segment = self._segments[0]
+            file_id, chunks, start = segment
+            take = min(rows, len(chunks) - start)
+            parts.append(chunks[start:start + take])
+            owners.append((file_id, take))
+            segment[2] += take
+            rows -= take
+            if segment[2] == len(chunks):
+                self._segments.popleft()
+
+        batch = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        self._buffered -= len(batch)
+        y_predict = self._predict(batch)
+
+        done = []
+        pos = 0
+        for file_id, take in owners:
+            self._outputs[file_id].append(y_predict[pos:pos + take])
+            pos += take
+            self._remaining[file_id] -= take
+            if self._remaining[file_id] == 0:
+                del self._remaining[file_id]
+                done.append((file_id, np.concatenate(self._outputs.pop(file_id))))
+        return done
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert the optimization-flag model to TFLite")
+    parser.add_argument('--output', '-o', default=None, help='Output .tflite path (default: next to the .h5 model)')
+    parser.add_argument('--samples', '-s', nargs='*', default=[], help='.so files used for the parity check')
+    parsed_args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    convert_model(parsed_args.output, parsed_args.samples)
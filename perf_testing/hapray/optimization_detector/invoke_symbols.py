@@ -1,83 +1,172 @@
+import hashlib
 import json
 import logging
 import os
-from typing import List, Tuple
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 
 from tqdm import tqdm
 
 from hapray.core.common.exe_utils import ExeUtils
+from hapray.core.common.result_store import ResultStore
 from hapray.optimization_detector.file_info import FileInfo
+from hapray.optimization_detector.hot_libraries import find_perf_dbs
+
+INVOKE_RESULT_KIND = 'invoke'
+EXPORTS_RESULT_KIND = 'elf_exports'
+EXPORTS_VERSION = '1'
+# Files per `hapray elf` process and number of such processes running at once
+ELF_BATCH_SIZE = 64
+ELF_MAX_CONCURRENCY = 4
+# Prefix of the per-file result lines printed by `hapray elf --manifest`
+ELF_RESULT_PREFIX = '@elf-result '
+
+
+def _report_fingerprint(report_dir: str) -> str:
+    """Identify the perf databases read by `hapray elf`, so results follow report changes."""
+    md5 = hashlib.md5()
+    for perf_db in find_perf_dbs(report_dir):
+        stat = os.stat(perf_db)
+        md5.update(f'{os.path.relpath(perf_db, report_dir)}:{stat.st_size}:{stat.st_mtime}\n'.encode())
+    return md5.hexdigest()
 
 
 class InvokeSymbols:
-    def __init__(self):
-        pass
+    def __init__(self, batch_size: int = ELF_BATCH_SIZE, max_concurrency: Optional[int] = None):
+        self.store = ResultStore.get_instance()
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency or min(ELF_MAX_CONCURRENCY, os.cpu_count() or 1)
+        self._lock = threading.Lock()
+
+    def _run_batch(self, file_infos: List[FileInfo], report_dir: str, work_dir: str, exports: Dict[str, list],
+                   on_result: Callable[[FileInfo, Optional[list]], None]):
+        """Run one `hapray elf` process for a batch of files, reporting each file as it finishes"""
+        tasks = []
+        by_output = {}
+        for file_info in file_infos:
+            output_file = os.path.join(work_dir, f"invoke_{file_info.file_id}.json")
+            # hapray elf reads the exports from an existing output file instead of parsing the ELF
+            if file_info.file_hash in exports:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    json.dump([{'symbol': symbol} for symbol in exports[file_info.file_hash]], f)
+            tasks.append({'input': file_info.ensure_on_disk(), 'output': output_file})
+            by_output[output_file] = file_info
+
+        fd, manifest = tempfile.mkstemp(prefix='manifest_', suffix='.json', dir=work_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(tasks, f)
+
+        for line in ExeUtils.stream_hapray_cmd(['elf', '-m', manifest, '-r', report_dir]):
+            if not line.startswith(ELF_RESULT_PREFIX):
+                logging.debug(line)
+                continue
+            result = json.loads(line[len(ELF_RESULT_PREFIX):])
+            file_info = by_output.pop(result['output'], None)
+            if file_info is None:
+                continue
+            data = None
+            if result.get('ok'):
+                # Read and parse the generated JSON output
+                with open(result['output'], 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            on_result(file_info, data)
 
-    def _process_file(self, file_info: FileInfo, report_dir: str) -> Tuple[list, dict]:
-        """Process a single file and return symbol data"""
-        output_file = os.path.join(FileInfo.CACHE_DIR, f"invoke_{file_info.file_id}.json")
-        # Execute the hapray command to analyze the ELF file
-        ExeUtils.execute_hapray_cmd(['elf', '-i', file_info.absolute_path, '-r', report_dir, '-o', output_file])
+        # Files the process never reported, e.g. because it crashed
+        for file_info in by_output.values():
+            on_result(file_info, None)
 
+    @staticmethod
+    def _build_rows(file_info: FileInfo, data: list) -> Tuple[list, dict]:
+        """Build the symbol rows and the summary of one logical file"""
         symbol_data = []
         invoked = 0
         summary_data = {'File': file_info.logical_path, 'count': 0, 'invoked': '' }
-        # Read and parse the generated JSON output
-        with open(output_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            # Extract relevant symbol information
-            for symbol in data:
-                if symbol.get('invoke'):
-                    invoked += 1
-                symbol_data.append({
-                    'File': file_info.logical_path,
-                    'Symbol': symbol.get('symbol'),
-                    'Invoke': symbol.get('invoke')
-                })
+        # Extract relevant symbol information
+        for symbol in data:
+            if symbol.get('invoke'):
+                invoked += 1
+            symbol_data.append({
+                'File': file_info.logical_path,
+                'Symbol': symbol.get('symbol'),
+                'Invoke': symbol.get('invoke')
+            })
         summary_data['count'] = len(symbol_data)
         summary_data['invoked'] = '{:.3f}'.format(invoked * 100 / len(symbol_data))
         return symbol_data, summary_data
 
     def analyze(self, file_infos: List[FileInfo], report_dir: str) -> List[Tuple[str, pd.DataFrame]]:
-        # Ensure cache directory exists
-        os.makedirs(FileInfo.CACHE_DIR, exist_ok=True)
+        version = _report_fingerprint(report_dir)
+        # Identical files with the same name are analyzed once and reported for every logical path;
+        # perf symbols are matched by file name, so invoke results are keyed by name and content
+        groups = {}
+        for file_info in file_infos:
+            groups.setdefault(file_info.file_id, []).append(file_info)
+        stored = self.store.get_many(INVOKE_RESULT_KIND, version, groups.keys())
+        pending = [group[0] for file_id, group in groups.items() if file_id not in stored]
+        exports = self.store.get_many(EXPORTS_RESULT_KIND, EXPORTS_VERSION,
+                                      (file_info.file_hash for file_info in pending))
         symbol_detail_data = []
         summary_data = []
 
-        # Create a progress bar with total number of files
-        progress_bar = tqdm(total=len(file_infos), desc="Analyzing files symbols", unit="file")
+        # Create a progress bar with total number of unique files
+        progress_bar = tqdm(total=len(groups), desc="Analyzing files symbols", unit="file")
+        reported = set()
 
-        # Use thread pool for parallel file processing
-        with ThreadPoolExecutor() as executor:
-            # Submit all file processing tasks to the thread pool
-            future_to_file = {
-                executor.submit(self._process_file, file_info, report_dir): file_info
-                for file_info in file_infos
-            }
-
-            # Process results as they complete with progress tracking
-            for future in as_completed(future_to_file):
-                file_info = future_to_file[future]
+        def add_result(file_info: FileInfo, data: Optional[list]):
+            with self._lock:
+                reported.add(file_info.file_id)
                 try:
-                    # Get the result from completed future
-                    file_data, summary  = future.result()
-                    # Add file results to main report
-                    symbol_detail_data.extend(file_data)
-                    summary_data.append(summary)
+                    if data is None:
+                        raise RuntimeError('hapray elf produced no result')
+                    if file_info.file_id not in stored:
+                        stored[file_info.file_id] = data
+                        self.store.put(INVOKE_RESULT_KIND, version, file_info.file_id, data)
+                        if file_info.file_hash not in exports:
+                            self.store.put(EXPORTS_RESULT_KIND, EXPORTS_VERSION, file_info.file_hash,
+                                           [symbol.get('symbol') for symbol in data])
+                    # Add file results to main report, once per logical path
+                    for logical_file in groups[file_info.file_id]:
+                        file_data, summary = self._build_rows(logical_file, data)
+                        symbol_detail_data.extend(file_data)
+                        summary_data.append(summary)
 
                     # Update progress bar with file name
                     progress_bar.set_postfix(file=file_info.logical_path, refresh=False)
                 except Exception as e:
                     # Handle errors for individual files without stopping entire process
                     logging.error(f"Error processing file {file_info.logical_path}: {str(e)}")
+                    # Failed files keep an empty summary row, so they are not missing from the report
+                    summary_data.extend({'File': logical_file.logical_path, 'count': 0, 'invoked': ''}
+                                        for logical_file in groups[file_info.file_id])
                 finally:
                     # Always update the progress count
                     progress_bar.update(1)
 
+        for file_id, data in list(stored.items()):
+            add_result(groups[file_id][0], data)
+
+        # Each batch is one hapray elf process loading the report once; batches run with bounded concurrency
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        with tempfile.TemporaryDirectory() as work_dir, \
+                ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [executor.submit(self._run_batch, batch, report_dir, work_dir, exports, add_result)
+                       for batch in batches]
+            for batch, future in zip(batches, futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Error processing symbol batch: {str(e)}")
+                    # Files of the batch not reported before the failure
+                    for file_info in batch:
+                        if file_info.file_id not in reported:
+                            add_result(file_info, None)
+
         # Close the progress bar when done
         progress_bar.close()
+        self.store.evict()
 
         # Convert collected data to DataFrame
         return [('symbols', pd.DataFrame(symbol_detail_data)), ('symbols_summary', pd.DataFrame(summary_data))]
@@ -0,0 +1,139 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from hapray.core.common.cache_utils import get_cache_dir
+
+KNOWN_BINARIES_DB = 'known_binaries.db'
+DEFAULT_SKIP_REASON = 'Listed as system library'
+# Stay below the default SQLite host parameter limit
+_QUERY_BATCH = 900
+_MD5_PATTERN = re.compile(r'^[0-9a-fA-F]{32}$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS known_binaries (
+    file_hash TEXT PRIMARY KEY,
+    name TEXT,
+    skip_reason TEXT,
+    source TEXT,
+    updated_at INTEGER
+) WITHOUT ROWID;
+"""
+
+
+class KnownBinary(NamedTuple):
+    """Entry of a known binary and the reason to skip it."""
+    file_hash: str
+    name: str
+    skip_reason: str
+    source: str
+
+
+class KnownBinaries:
+    """Persistent database of binaries that are not analyzed.
+
+    Entries are keyed by file content hash (md5). A listed binary, e.g. a system or SDK
+    library from a user-provided list, is reported as skipped without being extracted.
+    Entries are small and kept until listed again. Results of previous runs are served
+    by the result store, which evicts them.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(get_cache_dir(), KNOWN_BINARIES_DB)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def get_instance(cls) -> 'KnownBinaries':
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = KnownBinaries()
+        return cls._instance
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get_many(self, file_hashes: Iterable[str]) -> Dict[str, KnownBinary]:
+        """Look up many binaries at once.
+
+        Returns:
+            Mapping of file hash to entry for every known binary
+        """
+        unique = list(set(file_hashes))
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(unique), _QUERY_BATCH):
+                batch = unique[i:i + _QUERY_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                # Databases of older versions also hold run results, which have no skip reason
+                rows = conn.execute(
+                    f"SELECT file_hash, name, skip_reason, source FROM known_binaries "
+                    f"WHERE skip_reason IS NOT NULL AND file_hash IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for file_hash, name, skip_reason, source in rows:
+                    found[file_hash] = KnownBinary(file_hash, name, skip_reason, source)
+        return found
+
+    def add_skipped(self, entries: Dict[str, Tuple[str, str]], source: str = 'user'):
+        """Mark binaries as skipped.
+
+        Args:
+            entries: Mapping of file hash to (name, skip reason)
+            source: Origin of the entries, e.g. the list file
+        """
+        now = int(time.time())
+        rows = [(file_hash, name, reason, source, now) for file_hash, (name, reason) in entries.items()]
+        with self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO known_binaries (file_hash, name, skip_reason, source, updated_at) '
+                             'VALUES (?, ?, ?, ?, ?)', rows)
+
+    def import_list(self, list_path: str) -> int:
+        """Import a user-provided list of binaries to skip.
+
+        Every line holds an md5 file hash, optionally followed by a name and a reason
+        separated by commas (`<md5>[,<name>[,<reason>]]`); empty lines and lines starting
+        with '#' are ignored.
+
+        Returns:
+            Number of imported entries
+        """
+        entries = {}
+        with open(list_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                fields = [field.strip() for field in line.split(',', 2)]
+                if not _MD5_PATTERN.match(fields[0]):
+                    logging.warning("Ignoring invalid entry in %s line %d: %s", list_path, line_no, line)
+                    continue
+                name = fields[1] if len(fields) > 1 else ''
+                reason = fields[2] if len(fields) > 2 and fields[2] else DEFAULT_SKIP_REASON
+                entries[fields[0].lower()] = (name, reason)
+        self.add_skipped(entries, os.path.basename(list_path))
+        logging.info("Imported %d known binaries from %s", len(entries), list_path)
+        return len(entries)
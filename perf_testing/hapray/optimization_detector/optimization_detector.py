@@ -1,175 +1,383 @@
-import os
 import logging
+import math
 import multiprocessing
-from functools import partial
-from importlib.resources import files
-from typing import List, Dict, Tuple, Optional
+import queue
+import zlib
+from typing import List, Dict, Tuple, Optional, Iterator, Union
 from collections import Counter
 
 from tqdm import tqdm
 
 import numpy as np
 import pandas as pd
-import tensorflow as tf
 
-from hapray.optimization_detector.file_info import FileInfo, FILE_STATUS_MAPPING
+from hapray.core.common.result_store import ResultStore
+from hapray.core.common.worker_planner import WorkerPlan, plan_workers
+from hapray.optimization_detector.file_info import FileCollector, FileInfo, FILE_STATUS_MAPPING
+from hapray.optimization_detector.chunk_cache import ChunkPredictionCache
+from hapray.optimization_detector.inference import ChunkBatcher, load_backend, model_version
+from hapray.optimization_detector.known_binaries import KnownBinaries
+
+FLAGS_RESULT_KIND = 'flags'
+# Files per result store transaction
+STORE_BATCH_SIZE = 64
+# Score weight of each predicted class (O0, O1, O2, O3, Os)
+OPT_LEVEL_WEIGHTS = np.array([0.0, 0.33, 0.67, 1.0, 0.67])
+# Sampling mode: chunks inferred per round, and files below this size are always inferred fully
+SAMPLE_ROUND_CHUNKS = 256
+SAMPLE_MIN_CHUNKS = 2 * SAMPLE_ROUND_CHUNKS
+# Two-sided 95% normal quantile
+SAMPLE_Z = 1.96
+# Files handed to extraction workers but not yet consumed, per worker
+IN_FLIGHT_PER_WORKER = 2
+
+
+def _extract_file_features(file_info: FileInfo) -> Tuple[str, Optional[np.ndarray]]:
+    """Extraction worker: read the chunk matrix of a file"""
+    return file_info.file_id, OptimizationDetector._extract_features(file_info)
+
+
+def _extract_task_features(task: Tuple[str, Optional[FileInfo], Optional[bytes]]) -> Tuple[str, Optional[np.ndarray]]:
+    """Extraction worker: read the chunk matrix of a file on disk or of a shipped .text slice"""
+    file_id, file_info, text = task
+    if file_info is not None:
+        return _extract_file_features(file_info)
+    return file_id, OptimizationDetector._to_features(FileInfo.text_to_array(text, OptimizationDetector.FEATURES))
+
+
+def _feature_task(file_info: FileInfo) -> Tuple[str, Optional[FileInfo], Optional[bytes]]:
+    """Pickled to extraction workers: in-memory HAP members only send their .text slice"""
+    if file_info.data is None:
+        return file_info.file_id, file_info, None
+    return file_info.file_id, None, bytes(file_info.dot_text_slice())
 
 
 class OptimizationDetector:
+    # Bytes per chunk, the model input size
+    FEATURES = 2048
 
-    def __init__(self, workers: int = 1):
-        self.parallel = workers > 1
-        self.workers = min(workers, multiprocessing.cpu_count() - 1)
-        self.model = None
+    def __init__(self, workers: int = 1, backend: str = 'auto', chunk_cache: bool = True,
+                 plan: Optional[WorkerPlan] = None, sample_tolerance: Optional[float] = None):
+        """
+        Args:
+            sample_tolerance: Enables sampling mode: chunks of large files are inferred in
+                random rounds until the half-width of the score's 95% confidence interval
+                is at most this value and the category is unchanged from the previous round
+        """
+        self.plan = plan or plan_workers(workers)
+        self.workers = self.plan.extract_workers
+        self.parallel = self.workers > 1
+        self.backend_name = backend
+        self.backend = None
+        self.chunk_cache = chunk_cache
+        self.sample_tolerance = sample_tolerance
 
     @staticmethod
-    def _merge_chunk_results(df: pd.DataFrame) -> Dict[str, dict]:
-        results = {}
-        for file, group in df.groupby('file'):
-            predictions = group['prediction'].tolist()
-            distribution = dict(Counter(predictions))
-            most_common = Counter(predictions).most_common(1)[0][0]
-            confidence = predictions.count(most_common) / len(predictions)
-            total_chunks = len(predictions)
-
-            if any(x in distribution for x in [0, 1, 2, 3, 4]):
-                opt_score = (
-                                    distribution.get(0, 0) * 0 +  # O0
-                                    distribution.get(1, 0) * 0.33 +  # O1
-                                    distribution.get(2, 0) * 0.67 +  # O2
-                                    distribution.get(3, 0) * 1.0 +  # O3
-                                    distribution.get(4, 0) * 0.67  # Os
-                            ) / total_chunks
-
-                # Determine optimization category
-                if opt_score < 0.2:
-                    opt_category = "Unoptimized (O0 dominant)"
-                elif opt_score < 0.4:
-                    opt_category = "Low Optimization (O1 dominant)"
-                elif opt_score < 0.7:
-                    opt_category = "Medium Optimization (O2/Os dominant)"
-                else:
-                    opt_category = "High Optimization (O3 dominant)"
-            else:
-                opt_score = None
-                opt_category = None
-
-            results[file] = {
-                'prediction': most_common,
-                'confidence': confidence,
-                'distribution': distribution,
-                'opt_score': opt_score,
-                'opt_category': opt_category,
-                'total_chunks': total_chunks
-            }
+    def _merge_chunk_results(predictions: List[int]) -> dict:
+        distribution = dict(Counter(predictions))
+        most_common = Counter(predictions).most_common(1)[0][0]
+        confidence = predictions.count(most_common) / len(predictions)
+        total_chunks = len(predictions)
+
+        if any(x in distribution for x in [0, 1, 2, 3, 4]):
+            opt_score = sum(OPT_LEVEL_WEIGHTS[level] * count for level, count in distribution.items()) / total_chunks
+            opt_category = OptimizationDetector._opt_category(opt_score)
+        else:
+            opt_score = None
+            opt_category = None
 
-        return results
+        return {
+            'prediction': most_common,
+            'confidence': confidence,
+            'distribution': distribution,
+            'opt_score': opt_score,
+            'opt_category': opt_category,
+            'total_chunks': total_chunks
+        }
 
-    def detect_optimization(self, file_infos: List[FileInfo]) -> List[Tuple[str, pd.DataFrame]]:
-        success, failures, flags = self._analyze_files(file_infos)
-        logging.info("Analysis complete: %s files analyzed, %s files failed", success, failures)
-        return [('optimization', self._collect_results(flags, file_infos))]
+    @staticmethod
+    def _opt_category(opt_score: float) -> str:
+        if opt_score < 0.2:
+            return "Unoptimized (O0 dominant)"
+        if opt_score < 0.4:
+            return "Low Optimization (O1 dominant)"
+        if opt_score < 0.7:
+            return "Medium Optimization (O2/Os dominant)"
+        return "High Optimization (O3 dominant)"
 
     @staticmethod
-    def _extract_features(file_info: FileInfo, features: int = 2048) -> Optional[np.ndarray]:
-        data = file_info.extract_dot_text()
-        if not data or len(data) == 0:
+    def _score_interval(predictions: List[int], total_chunks: int) -> Tuple[float, float]:
+        """Mean chunk score and half-width of its 95% confidence interval.
+
+        Chunks are sampled without replacement, so the finite population correction
+        shrinks the interval to zero once every chunk has been inferred.
+        """
+        scores = OPT_LEVEL_WEIGHTS[np.asarray(predictions)]
+        sampled = len(scores)
+        mean = float(scores.mean())
+        if sampled < 2 or sampled >= total_chunks:
+            return mean, 0.0
+        correction = (total_chunks - sampled) / (total_chunks - 1)
+        half_width = SAMPLE_Z * float(scores.std(ddof=1)) * math.sqrt(correction / sampled)
+        return mean, half_width
+
+    def detect_optimization(self, file_infos: List[FileInfo],
+                            cold_files: Optional[List[FileInfo]] = None) -> List[Tuple[str, pd.DataFrame]]:
+        """Detect optimization flags of files; cold_files are only listed as skipped in the report"""
+        success, failures, flags, skipped = self._analyze_files(file_infos)
+        logging.info("Analysis complete: %s files analyzed, %s files skipped, %s files failed",
+                     success, len(skipped), failures)
+        return [('optimization', self._collect_results(flags, file_infos, cold_files or [], skipped))]
+
+    @classmethod
+    def _extract_features(cls, file_info: FileInfo) -> Optional[np.ndarray]:
+        # .text is read zero-padded to a multiple of the chunk size, so it reshapes in place
+        return cls._to_features(file_info.extract_dot_text(cls.FEATURES))
+
+    @classmethod
+    def _to_features(cls, data: np.ndarray) -> Optional[np.ndarray]:
+        if data.size == 0:
             return None
+        return data.reshape(-1, cls.FEATURES)
 
-        sequences = []
-        while data:
-            seq = data[:features]
-            if len(seq) < features:
-                seq = np.pad(seq, (0, features - len(seq)), 'constant')
-            sequences.append(seq)
-            data = data[features:]
-        return np.array(sequences, dtype=np.uint8)
-
-    def _run_inference(self, file_info: FileInfo, model, features: int = 2048) -> List[Tuple[int, float]]:
-        features_array = self._extract_features(file_info, features)
-        if features_array is None or not features_array.size:
-            return []
-
-        y_predict = model.predict(features_array, batch_size=256)
-        results = []
-        for _predict in y_predict:
-            prediction = np.argmax(_predict)
-            confidence = _predict[prediction]
-            results.append((prediction, confidence))
-        return results
-
-    def _run_analysis(self, file_info: FileInfo) -> Tuple[FileInfo, Optional[List[Tuple[int, float]]]]:
-        """Run optimization flag detection on a single file"""
-        # Lazy load model
-        if self.model is None:
-            flags_model = files('hapray.optimization_detector').joinpath("models/aarch64-flag-lstm-converted.h5")
-            self.model = tf.keras.models.load_model(str(flags_model))
-
-        return file_info, self._run_inference(file_info, self.model)
-
-    def _analyze_files(self, file_infos: List[FileInfo]) -> Tuple[int, int, Dict]:
-        # Filter out analyzed files
-        remaining_files = []
-        for file_info in file_infos:
-            flags_path = os.path.join(FileInfo.CACHE_DIR, f"flags_{file_info.file_id}.csv")
-            if os.path.exists(flags_path):
-                logging.debug("Skipping already analyzed file: %s", file_info.absolute_path)
+    @staticmethod
+    def _to_chunk_results(y_predict: np.ndarray) -> List[Tuple[int, float]]:
+        predictions = np.argmax(y_predict, axis=1)
+        confidences = y_predict[np.arange(len(y_predict)), predictions]
+        return list(zip(predictions.tolist(), confidences.tolist()))
+
+    def _load_backend(self):
+        if self.backend is None:
+            self.backend = load_backend(self.backend_name, self.plan.intra_op_threads, self.plan.inter_op_threads)
+            logging.info("Using %s inference backend with %d threads", self.backend.name, self.plan.intra_op_threads)
+        return self.backend
+
+    def _predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        # Model is loaded lazily on the first batch, after extraction workers were forked
+        return self._load_backend().predict(batch)
+
+    def _iter_features(self, file_infos: List[FileInfo]) -> Iterator[Tuple[str, Optional[np.ndarray]]]:
+        """Yield (file_id, chunk matrix) as extraction finishes, in parallel when enabled."""
+        if self.parallel and len(file_infos) > 1:
+            logging.info("Using %d parallel extraction workers and one inference process", self.workers)
+            with multiprocessing.Pool(self.workers) as pool:
+                yield from self._iter_pool(pool, file_infos)
+        else:
+            for file_info in file_infos:
+                yield _extract_file_features(file_info)
+
+    def _iter_pool(self, pool, file_infos: List[FileInfo]) -> Iterator[Tuple[str, Optional[np.ndarray]]]:
+        """Yield extraction results in completion order with a bounded number of files in flight.
+
+        A new file is submitted only after a result was taken, so slow inference holds back
+        extraction instead of piling up chunk matrices and .text slices in memory.
+        """
+        done = queue.Queue()
+        remaining = iter(file_infos)
+        in_flight = 0
+
+        def submit() -> bool:
+            file_info = next(remaining, None)
+            if file_info is None:
+                return False
+            pool.apply_async(_extract_task_features, (_feature_task(file_info),),
+                             callback=done.put, error_callback=done.put)
+            return True
+
+        while in_flight < IN_FLIGHT_PER_WORKER * self.workers and submit():
+            in_flight += 1
+        while in_flight:
+            result = done.get()
+            in_flight -= 1
+            if isinstance(result, BaseException):
+                raise result
+            if submit():
+                in_flight += 1
+            yield result
+
+    @staticmethod
+    def _lookup_chunks(features: np.ndarray, cache: Optional[ChunkPredictionCache]) -> Tuple[List[str], Dict, Dict]:
+        """Hash chunks and find the ones still to predict.
+
+        Returns:
+            Tuple (chunk hashes, known predictions by hash, first row of every unique unknown chunk)
+        """
+        hashes = ChunkPredictionCache.hash_chunks(features)
+        known = cache.get_many(hashes) if cache else {}
+        first_rows = {}
+        for row, chunk_hash in enumerate(hashes):
+            if chunk_hash not in known and chunk_hash not in first_rows:
+                first_rows[chunk_hash] = row
+        return hashes, known, first_rows
+
+    def _sample_file(self, file_id: str, features: np.ndarray, cache: Optional[ChunkPredictionCache]) -> dict:
+        """Infer random chunks of a file in rounds until the score interval and category are stable."""
+        total_chunks = len(features)
+        # Seeded by the file, so repeated runs sample the same chunks
+        order = np.random.default_rng(zlib.crc32(file_id.encode())).permutation(total_chunks)
+        flags = []
+        previous_category = None
+        score, half_width = 0.0, 0.0
+        for start in range(0, total_chunks, SAMPLE_ROUND_CHUNKS):
+            rows = features[np.sort(order[start:start + SAMPLE_ROUND_CHUNKS])]
+            hashes, known, first_rows = self._lookup_chunks(rows, cache)
+            if first_rows:
+                y_predict = self._predict_batch(rows[list(first_rows.values())])
+                predicted = dict(zip(first_rows, self._to_chunk_results(y_predict)))
+                if cache:
+                    cache.put_many(predicted)
+                known.update(predicted)
+            flags.extend(known[h] for h in hashes)
+
+            score, half_width = self._score_interval([pred for pred, _ in flags], total_chunks)
+            category = self._opt_category(score)
+            if half_width <= self.sample_tolerance and category == previous_category:
+                break
+            previous_category = category
+
+        logging.debug("Sampled %d of %d chunks of %s: score %.3f +/- %.3f",
+                      len(flags), total_chunks, file_id, score, half_width)
+        return {
+            'flags': flags,
+            'total_chunks': total_chunks,
+            'score_interval': [max(0.0, score - half_width), min(1.0, score + half_width)],
+        }
+
+    def _run_analysis(self, file_infos: List[FileInfo]) -> Iterator[Tuple[str, Union[List, dict]]]:
+        """Run optimization flag detection on files, batching chunks across files.
+
+        Yields (file_id, chunk results); in sampling mode large files yield a dict with the
+        sampled chunk results, the total chunk count and the score interval instead.
+        """
+        batcher = ChunkBatcher(self._predict_batch)
+        cache = ChunkPredictionCache(model_version()) if self.chunk_cache else None
+        # file_id -> (chunk hashes, known predictions, hashes sent to the model)
+        pending = {}
+
+        def finish(done_id: str, y_predict: np.ndarray) -> Tuple[str, List[Tuple[int, float]]]:
+            hashes, known, miss_hashes = pending.pop(done_id)
+            predicted = dict(zip(miss_hashes, self._to_chunk_results(y_predict)))
+            if cache:
+                cache.put_many(predicted)
+            known.update(predicted)
+            return done_id, [known[h] for h in hashes]
+
+        try:
+            for file_id, features in self._iter_features(file_infos):
+                if features is None:
+                    yield file_id, []
+                    continue
+                if self.sample_tolerance is not None and len(features) >= SAMPLE_MIN_CHUNKS:
+                    yield file_id, self._sample_file(file_id, features, cache)
+                    continue
+                # Only unique, not yet predicted chunks go to the model
+                hashes, known, first_rows = self._lookup_chunks(features, cache)
+                if not first_rows:
+                    yield file_id, [known[h] for h in hashes]
+                    continue
+                pending[file_id] = (hashes, known, list(first_rows))
+                for done_id, y_predict in batcher.add(file_id, features[list(first_rows.values())]):
+                    yield finish(done_id, y_predict)
+            for done_id, y_predict in batcher.flush():
+                yield finish(done_id, y_predict)
+        finally:
+            if cache:
+                logging.info("Chunk prediction cache: %d hits, %d misses", cache.hits, cache.misses)
+                cache.evict()
+                cache.close()
+
+    @classmethod
+    def _merge_stored(cls, flags: Union[List, dict]) -> dict:
+        """Merge stored chunk results, full or sampled, into the per-file result"""
+        if not isinstance(flags, dict):
+            return cls._merge_chunk_results([pred for pred, _ in flags])
+        result = cls._merge_chunk_results([pred for pred, _ in flags['flags']])
+        result['sampled_chunks'] = result['total_chunks']
+        result['total_chunks'] = flags['total_chunks']
+        result['score_interval'] = flags['score_interval']
+        return result
+
+    def _analyze_files(self, file_infos: List[FileInfo]) -> Tuple[int, int, Dict, Dict]:
+        store = ResultStore.get_instance()
+        known_binaries = KnownBinaries.get_instance()
+        version = model_version()
+        if self.sample_tolerance is not None:
+            # Sampled results depend on the tolerance and must not be mixed with exact ones
+            version = f'{version}:sample-{self.sample_tolerance}'
+        # Each unique binary is analyzed once, its result is reported for every logical path
+        groups = FileCollector.group_by_hash(file_infos)
+
+        # Known binaries are skipped before anything is extracted
+        skip_reasons = {}
+        for file_hash, entry in known_binaries.get_many(groups).items():
+            skip_reasons[file_hash] = entry.skip_reason
+            logging.debug("Skipping known binary %s: %s", groups[file_hash][0].logical_path, entry.skip_reason)
+        logging.info("Known binaries: %d skipped", len(skip_reasons))
+
+        # Results are stored by content, so renamed or copied files and previous runs are not analyzed again
+        lookup_hashes = [file_hash for file_hash in groups if file_hash not in skip_reasons]
+        stored = store.get_many(FLAGS_RESULT_KIND, version, lookup_hashes)
+        remaining_files = {}
+        for file_hash in lookup_hashes:
+            if file_hash in stored:
+                logging.debug("Skipping already analyzed file: %s", groups[file_hash][0].logical_path)
                 continue
-            remaining_files.append(file_info)
+            remaining_files[file_hash] = groups[file_hash][0]
 
         logging.info("Files to analyze: %d", len(remaining_files))
 
-        # Create directory for intermediate results
-        os.makedirs(FileInfo.CACHE_DIR, exist_ok=True)
-
         if remaining_files:
-            process_func = partial(self._run_analysis)
-            if self.parallel and len(remaining_files) > 1:
-                logging.info("Using %d parallel workers", self.workers)
-                with multiprocessing.Pool(self.workers) as pool:
-                    results = list(tqdm(
-                        pool.imap(process_func, remaining_files),
-                        total=len(remaining_files),
-                        desc="Analyzing binaries optimization"
-                    ))
-            else:
-                results = [process_func(fi) for fi in tqdm(remaining_files, desc="Analyzing binaries optimization")]
+            file_hashes = {file_info.file_id: file_hash for file_hash, file_info in remaining_files.items()}
+            new_results = {}
+            with tqdm(total=len(remaining_files), desc="Analyzing binaries optimization") as progress_bar:
+                for file_id, flags in self._run_analysis(list(remaining_files.values())):
+                    progress_bar.update(1)
+                    if not flags:
+                        continue
+                    new_results[file_hashes[file_id]] = flags
+                    # Save intermediate results in batches
+                    if len(new_results) >= STORE_BATCH_SIZE:
+                        store.put_many(FLAGS_RESULT_KIND, version, new_results)
+                        stored.update(new_results)
+                        new_results = {}
+            store.put_many(FLAGS_RESULT_KIND, version, new_results)
+            stored.update(new_results)
+            store.evict()
 
-            # Save intermediate results
-            for file_info, flags in results:
-                if flags:
-                    flags_path = os.path.join(FileInfo.CACHE_DIR, f"flags_{file_info.file_id}.csv")
-                    with open(flags_path, "w", encoding='UTF-8') as f:
-                        f.write("file,prediction,confidence\n")
-                        for pred, conf in flags:
-                            f.write(f"{file_info.file_id},{pred},{conf}\n")
+        results = {file_hash: self._merge_stored(flags) for file_hash, flags in stored.items() if flags}
 
         flags_results = {}
-        files_with_results = 0
+        skipped = {}
         for file_info in file_infos:
-            flags_path = os.path.join(FileInfo.CACHE_DIR, f"flags_{file_info.file_id}.csv")
-            if os.path.exists(flags_path):
-                try:
-                    flags_df = pd.read_csv(flags_path)
-                    if not flags_df.empty:
-                        file_results = self._merge_chunk_results(flags_df)
-                        flags_results.update(file_results)
-                        files_with_results += 1
-                except Exception as e:
-                    logging.error("Error loading results for %s: %s", file_info.absolute_path, e)
-
-        return files_with_results, len(file_infos) - files_with_results, flags_results
-
-    def _collect_results(self, flags_results: dict, file_infos: List[FileInfo]) -> pd.DataFrame:
+            if file_info.file_hash in skip_reasons:
+                skipped[file_info.file_id] = skip_reasons[file_info.file_hash]
+            elif file_info.file_hash in results:
+                flags_results[file_info.file_id] = results[file_info.file_hash]
+
+        # Counted per logical path: identical copies share their file_id and their result
+        success = sum(file_info.file_id in flags_results for file_info in file_infos)
+        skipped_count = sum(file_info.file_id in skipped for file_info in file_infos)
+        return success, len(file_infos) - success - skipped_count, flags_results, skipped
+
+    def _collect_results(self, flags_results: dict, file_infos: List[FileInfo],
+                         cold_files: List[FileInfo], skipped: Optional[Dict[str, str]] = None) -> pd.DataFrame:
         report_data = []
-        for file_info in sorted(file_infos, key=lambda x: x.logical_path):
+        cold_ids = {id(file_info) for file_info in cold_files}
+        for file_info in sorted(file_infos + cold_files, key=lambda x: x.logical_path):
             result = flags_results.get(file_info.file_id)
             if result is None:
-                status = FILE_STATUS_MAPPING['failed']
+                if id(file_info) in cold_ids:
+                    status = FILE_STATUS_MAPPING['cold']
+                elif skipped and file_info.file_id in skipped:
+                    status = FILE_STATUS_MAPPING['skipped']
+                else:
+                    status = FILE_STATUS_MAPPING['failed']
                 opt_category = 'N/A'
                 opt_score = 'N/A'
                 distribution = {0: 0, 1: 0, 2: 0, 3: 0, 4: 0}
                 total_chunks = 0
+                sampled_chunks = 0
+                score_interval = None
                 size_optimized = 'N/A'
             else:
                 status = FILE_STATUS_MAPPING['analyzed']
@@ -177,8 +385,10 @@ class OptimizationDetector:
                 opt_score = result['opt_score']
                 distribution = result['distribution']
                 total_chunks = result['total_chunks']
+                sampled_chunks = result.get('sampled_chunks', total_chunks)
+                score_interval = result.get('score_interval', [opt_score, opt_score])
                 os_chunks = distribution.get(4, 0)
-                os_ratio = os_chunks / total_chunks if total_chunks > 0 else 0
+                os_ratio = os_chunks / sampled_chunks if sampled_chunks > 0 else 0
                 size_optimized = f"{'Yes' if os_ratio >= 0.5 else 'No'} ({os_ratio:.1%})"
 
             row = {
@@ -195,5 +405,10 @@ class OptimizationDetector:
                 "File Size (bytes)": file_info.file_size,
                 "Size Optimized": size_optimized,
             }
+            if self.sample_tolerance is not None:
+                # O0..Os chunk counts are those of the sample
+                row["Sample Fraction"] = f"{sampled_chunks / total_chunks:.1%}" if total_chunks else 'N/A'
+                row["Score 95% CI"] = (f"{score_interval[0]:.2%} - {score_interval[1]:.2%}"
+                                       if score_interval and isinstance(score_interval[0], float) else 'N/A')
             report_data.append(row)
         return pd.DataFrame(report_data)
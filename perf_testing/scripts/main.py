@@ -14,17 +14,33 @@ limitations under the License.
 """
 
 import argparse
+import multiprocessing
 import os
 import sys
 import logging
 from logging.handlers import RotatingFileHandler
 
-from hapray.actions.opt_action import OptAction
-from hapray.actions.perf_action import PerfAction
-from hapray.actions.update_action import UpdateAction
+from hapray.core.common.tool_runner import ToolRunner
 from hapray.core.config.config import Config
 
 
+# Actions are imported only when chosen: perf pulls in xdevice/hypium, opt TensorFlow and pandas.
+# Plain import statements (no importlib) keep them visible to the PyInstaller analysis of main.spec.
+def _perf_action():
+    from hapray.actions.perf_action import PerfAction
+    return PerfAction
+
+
+def _opt_action():
+    from hapray.actions.opt_action import OptAction
+    return OptAction
+
+
+def _update_action():
+    from hapray.actions.update_action import UpdateAction
+    return UpdateAction
+
+
 def configure_logging(log_file='HapRay.log'):
     """配置日志系统，同时输出到控制台和文件"""
     logger = logging.getLogger()
@@ -56,9 +72,9 @@ class HapRayCmd:
         configure_logging('HapRay.log')
 
         actions = {
-            "perf": PerfAction,
-            "opt": OptAction,
-            "update": UpdateAction
+            "perf": _perf_action,
+            "opt": _opt_action,
+            "update": _update_action
         }
 
         parser = argparse.ArgumentParser(
@@ -82,7 +98,8 @@ class HapRayCmd:
         args = parser.parse_args(action_args)
 
         # Dispatch to action handler
-        actions[args.action].execute(sub_args)
+        actions[args.action]().execute(sub_args)
+        ToolRunner.get_instance().log_summary()
 
     def _load_config(self):
         """Loads application configuration from YAML file."""
@@ -91,4 +108,6 @@ class HapRayCmd:
 
 
 if __name__ == "__main__":
+    # Device processes of sharded perf runs are spawned, also from the PyInstaller build
+    multiprocessing.freeze_support()
     HapRayCmd()
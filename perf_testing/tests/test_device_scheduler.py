@@ -0,0 +1,176 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+import pytest
+
+from hapray.core.device_scheduler import DeviceDriver, DeviceScheduler, RoundTask
+
+
+class FakeDeviceDriver(DeviceDriver):
+    """Records which device ran which round; rounds of slow cases take longer."""
+
+    def __init__(self, slow_cases=(), delay: float = 0.05):
+        self.slow_cases = set(slow_cases)
+        self.delay = delay
+        self.runs = []
+        self._lock = threading.Lock()
+
+    def run_case(self, task: RoundTask, output: str, device_sn: Optional[str],
+                 capture_steps: Optional[List[int]] = None):
+        time.sleep(self.delay * (5 if task.case_name in self.slow_cases else 1))
+        with self._lock:
+            self.runs.append((task, device_sn, capture_steps))
+
+
+def _tasks(cases, rounds):
+    return [RoundTask(case, f'/cases/{case}', round_num) for case in cases for round_num in range(rounds)]
+
+
+def _run(scheduler: DeviceScheduler, driver: FakeDeviceDriver):
+    scheduler.run(lambda task, device: driver.run_case(task, f'/out/{task.name}', device))
+
+
+def test_device_driver_is_abstract():
+    with pytest.raises(TypeError):
+        DeviceDriver()
+
+
+def test_assign_keeps_rounds_of_a_case_on_one_device():
+    scheduler = DeviceScheduler(['A', 'B'])
+    scheduler.assign(_tasks(['case1', 'case2', 'case3'], 2))
+
+    assert [task.case_name for task in scheduler.queues['A']] == ['case1', 'case1', 'case3', 'case3']
+    assert [task.case_name for task in scheduler.queues['B']] == ['case2', 'case2']
+
+
+def test_every_round_runs_exactly_once():
+    tasks = _tasks(['case1', 'case2', 'case3'], 3)
+    scheduler = DeviceScheduler(['A', 'B', 'C'])
+    scheduler.assign(tasks)
+    driver = FakeDeviceDriver()
+
+    _run(scheduler, driver)
+
+    assert sorted(task.name for task, _, _ in driver.runs) == sorted(task.name for task in tasks)
+    assert {device for _, device, _ in driver.runs} == {'A', 'B', 'C'}
+
+
+def test_idle_device_steals_from_the_tail_of_the_longest_queue():
+    scheduler = DeviceScheduler(['A', 'B'])
+    scheduler.assign(_tasks(['case1'], 4))
+
+    stolen = scheduler.next_task('B')
+
+    assert stolen == RoundTask('case1', '/cases/case1', 3)
+    assert scheduler.next_task('A') == RoundTask('case1', '/cases/case1', 0)
+
+
+def test_fast_device_takes_over_rounds_of_a_slow_one():
+    scheduler = DeviceScheduler(['A', 'B'])
+    # case1 is queued on A and slow, case2 on B finishes quickly
+    scheduler.assign(_tasks(['case1', 'case2'], 4))
+    driver = FakeDeviceDriver(slow_cases=['case1'])
+
+    _run(scheduler, driver)
+
+    case1_devices = [device for task, device, _ in driver.runs if task.case_name == 'case1']
+    assert len(case1_devices) == 4
+    assert 'B' in case1_devices
+
+
+def test_failing_round_does_not_stop_the_device():
+    scheduler = DeviceScheduler(['A'])
+    scheduler.assign(_tasks(['case1'], 3))
+    done = []
+
+    def run_task(task, device):
+        if task.round_num == 1:
+            raise RuntimeError('device disconnected')
+        done.append(task.round_num)
+
+    scheduler.run(run_task)
+
+    assert done == [0, 2]
+
+
+class RoundWritingDriver(FakeDeviceDriver):
+    """Writes the data layout of a complete round, except for the rounds listed as failing."""
+
+    def __init__(self, failing_rounds=()):
+        super().__init__(delay=0.01)
+        self.failing_rounds = set(failing_rounds)
+
+    def run_case(self, task: RoundTask, output: str, device_sn: Optional[str],
+                 capture_steps: Optional[List[int]] = None):
+        super().run_case(task, output, device_sn, capture_steps)
+        if task.name in self.failing_rounds:
+            return
+        os.makedirs(os.path.join(output, 'hiperf', 'step1'), exist_ok=True)
+        os.makedirs(os.path.join(output, 'htrace', 'step1'), exist_ok=True)
+        with open(os.path.join(output, 'hiperf', 'steps.json'), 'w', encoding='utf-8') as f:
+            json.dump([{'stepIdx': 1, 'description': 'step'}], f)
+        with open(os.path.join(output, 'hiperf', 'step1', 'perf.data'), 'wb') as f:
+            f.write(b'PERFILE2'.ljust(8192, b'\0'))
+        with open(os.path.join(output, 'htrace', 'step1', 'trace.htrace'), 'wb') as f:
+            f.write(b'OHOSPROF'.ljust(8192, b'\0'))
+
+
+class FakePipeline:
+    def submit(self, round_dir: str) -> str:
+        return f'converted:{os.path.basename(round_dir)}'
+
+
+def test_run_rounds_merges_sharded_rounds_and_records_devices(tmp_path):
+    pytest.importorskip('xdevice')
+    from hapray.actions.perf_action import PerfAction
+    from hapray.core.config.config import Config
+
+    Config.set('trace.enable', True)
+    Config.set('capture.continuous', False)
+    driver = RoundWritingDriver(failing_rounds=['case2_round1'])
+    cases = {}
+
+    def on_case_done(case_name, round_dirs, futures):
+        cases[case_name] = (round_dirs, futures)
+
+    PerfAction.run_rounds(_tasks(['case1', 'case2'], 2), ['A', 'B'], driver, str(tmp_path), FakePipeline(),
+                          on_case_done)
+
+    # Complete rounds are moved out of the device folders to where round selection expects them
+    for name in ('case1_round0', 'case1_round1', 'case2_round0'):
+        assert os.path.isfile(tmp_path / name / 'hiperf' / 'step1' / 'perf.data')
+    assert not os.path.exists(tmp_path / 'case2_round1')
+    for device in ('A', 'B'):
+        device_dir = tmp_path / 'devices' / device
+        assert not os.path.isdir(device_dir) or not [name for name in os.listdir(device_dir)
+                                                     if name.startswith('case') and name != 'case2_round1']
+
+    # Every complete round is recorded with the device that captured it, the failed one is left out
+    with open(tmp_path / 'devices.json', 'r', encoding='utf-8') as f:
+        placement = json.load(f)
+    captured_on = {task.name: device for task, device, _ in driver.runs}
+    assert placement == {name: captured_on[name] for name in ('case1_round0', 'case1_round1', 'case2_round0')}
+
+    assert cases == {
+        'case1': ([str(tmp_path / 'case1_round0'), str(tmp_path / 'case1_round1')],
+                  ['converted:case1_round0', 'converted:case1_round1']),
+        'case2': ([str(tmp_path / 'case2_round0')], ['converted:case2_round0']),
+    }
@@ -0,0 +1,51 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+PERF_TESTING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules only the chosen action may import: device frameworks, ML and data libraries, analyzers
+HEAVY_MODULES = (
+    'tensorflow', 'pandas', 'numpy', 'xdevice', 'hypium', 'devicetest',
+    'hapray.actions', 'hapray.analyze', 'hapray.optimization_detector',
+)
+IMPORT_SCRIPT = f"""
+import json, sys, time
+sys.path.insert(0, 'scripts')
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in sys.modules
+               if any(name == module or name.startswith(module + '.') for module in {HEAVY_MODULES!r}))
+print(json.dumps({{'elapsed': elapsed, 'modules': heavy}}))
+"""
+
+
+def _import_main() -> dict:
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=PERF_TESTING_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_main_imports_no_action_dependencies():
+    assert _import_main()['modules'] == []
+
+
+def test_main_import_time():
+    # Without the action dependencies importing main only loads the config and tool runner
+    assert _import_main()['elapsed'] < 2.0
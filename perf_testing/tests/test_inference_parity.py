@@ -0,0 +1,79 @@
+"""
+Copyright (c) 2025 Huawei Device Co., Ltd.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from hapray.optimization_detector.inference import (FEATURES, TFLITE_MODEL, ChunkBatcher, KerasBackend,
+                                                    TFLiteBackend, _model_path, _sample_chunks, check_parity,
+                                                    convert_model)
+
+
+# Real machine code for the parity samples (on platforms where numpy ships .so extensions)
+SAMPLE_FILES = sorted(glob.glob(os.path.join(os.path.dirname(np.__file__), '**', '*.so'), recursive=True))[:2]
+
+
+class EchoBackend:
+    """Backend returning fixed per-row outputs, for parity checks without a model"""
+
+    def __init__(self, offset: float = 0.0):
+        self.offset = offset
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        rows = batch[:, :5].astype(np.float32) / 255
+        return rows + self.offset
+
+
+def test_check_parity_accepts_matching_backends():
+    samples = _sample_chunks([])
+    assert check_parity(EchoBackend(), EchoBackend(1e-4), samples) == pytest.approx(1e-4, abs=1e-6)
+
+
+def test_check_parity_rejects_drift():
+    with pytest.raises(ValueError):
+        check_parity(EchoBackend(), EchoBackend(0.01), _sample_chunks([]))
+
+
+def test_batcher_returns_predictions_per_file():
+    batcher = ChunkBatcher(EchoBackend().predict, batch_size=4)
+    chunks = {name: np.full((rows, FEATURES), rows, dtype=np.uint8) for name, rows in (('a', 3), ('b', 6), ('c', 1))}
+    done = []
+    for name, rows in chunks.items():
+        done.extend(batcher.add(name, rows))
+    done.extend(batcher.flush())
+    assert sorted(name for name, _ in done) == ['a', 'b', 'c']
+    for name, y_predict in done:
+        np.testing.assert_array_equal(y_predict, EchoBackend().predict(chunks[name]))
+
+
+@pytest.fixture(scope='module')
+def keras_backend():
+    pytest.importorskip('tensorflow')
+    return KerasBackend()
+
+
+def test_converted_model_matches_keras(keras_backend, tmp_path):
+    """Convert the Keras model; convert_model raises if the outputs do not match"""
+    output_path = convert_model(str(tmp_path / 'model.tflite'), SAMPLE_FILES)
+    check_parity(keras_backend, TFLiteBackend(output_path), _sample_chunks(SAMPLE_FILES))
+
+
+def test_shipped_model_matches_keras(keras_backend):
+    if not os.path.exists(_model_path(TFLITE_MODEL)):
+        pytest.skip('No converted model shipped')
+    check_parity(keras_backend, TFLiteBackend(), _sample_chunks(SAMPLE_FILES))
@@ -17,17 +17,29 @@ import fs from 'fs';
 import path from 'path';
 import { Command } from 'commander';
 import Logger, { LOG_MODULE_TYPE } from 'arkanalyzer/lib/utils/logger';
-import { ElfAnalyzer } from '../../core/elf/elf_analyzer';
+import { ElfAnalyzer, ElfTask } from '../../core/elf/elf_analyzer';
 
 const logger = Logger.getLogger(LOG_MODULE_TYPE.TOOL);
 
-export const ElfAnalyzerCli = new Command('elf')
-    .requiredOption('-i, --input <string>', 'so file path')
-    .requiredOption('-r, --report_dir <string>', 'Directory containing reports to read')
-    .requiredOption('-o, --output <string>', 'output file')
-    .action(async (...args: any[]) => {
-        await main(args[0].input, args[0].report_dir, args[0].output);
-    });
+// Prefix of the per-file result lines printed in manifest mode
+const RESULT_PREFIX = '@elf-result ';
+
+export function createElfAnalyzerCli(): Command {
+    return new Command('elf')
+        .option('-i, --input <string>', 'so file path')
+        .option('-m, --manifest <string>', 'JSON file with a list of {input, output} to analyze in one run')
+        .requiredOption('-r, --report_dir <string>', 'Directory containing reports to read')
+        .option('-o, --output <string>', 'output file')
+        .action(async (...args: any[]) => {
+            if (args[0].manifest) {
+                await batch(args[0].manifest, args[0].report_dir);
+            } else if (args[0].input && args[0].output) {
+                await main(args[0].input, args[0].report_dir, args[0].output);
+            } else {
+                logger.error('Either --manifest or both --input and --output are required.');
+            }
+        });
+}
 
 async function main(input: string, report: string, output: string): Promise<void> {
     if (!fs.existsSync(input)) {
@@ -47,3 +59,31 @@ async function main(input: string, report: string, output: string): Promise<void
     let symbols = await ElfAnalyzer.getInstance().getInvokeSymbols(input, report, output);
     fs.writeFileSync(output, JSON.stringify(symbols));
 }
+
+async function batch(manifest: string, report: string): Promise<void> {
+    if (!fs.existsSync(report)) {
+        logger.error(`${report} is not exists.`);
+        return;
+    }
+
+    let tasks: ElfTask[] = JSON.parse(fs.readFileSync(manifest, { encoding: 'utf-8' }));
+    let validTasks: ElfTask[] = [];
+    for (const task of tasks) {
+        if (!fs.existsSync(task.input)) {
+            logger.error(`${task.input} is not exists.`);
+            console.log(RESULT_PREFIX + JSON.stringify({ input: task.input, output: task.output, ok: false }));
+            continue;
+        }
+        validTasks.push(task);
+    }
+
+    await ElfAnalyzer.getInstance().getInvokeSymbolsBatch(validTasks, report, (task, symbols) => {
+        if (symbols) {
+            if (!fs.existsSync(path.dirname(task.output))) {
+                fs.mkdirSync(path.dirname(task.output), { recursive: true });
+            }
+            fs.writeFileSync(task.output, JSON.stringify(symbols));
+        }
+        console.log(RESULT_PREFIX + JSON.stringify({ input: task.input, output: task.output, ok: symbols !== null }));
+    });
+}
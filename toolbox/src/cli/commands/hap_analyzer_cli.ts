@@ -19,12 +19,14 @@ import Logger, { LOG_MODULE_TYPE } from 'arkanalyzer/lib/utils/logger';
 
 const logger = Logger.getLogger(LOG_MODULE_TYPE.TOOL);
 
-export const HapAnalyzerCli = new Command('analyzer')
-    .requiredOption('-i, --input <string>', 'Hap file path')
-    .option('-o, --output <string>', 'output path', './')
-    .action(async (...args: any[]) => {
-        await main(args[0].hapPkgPath, args[0].output);
-    });
+export function createHapAnalyzerCli(): Command {
+    return new Command('analyzer')
+        .requiredOption('-i, --input <string>', 'Hap file path')
+        .option('-o, --output <string>', 'output path', './')
+        .action(async (...args: any[]) => {
+            await main(args[0].hapPkgPath, args[0].output);
+        });
+}
 
 async function main(hapPkgPath: string, output: string): Promise<void> {
     if (!fs.existsSync(hapPkgPath)) {
@@ -22,30 +22,39 @@ import { PerfAnalyzer, Step } from '../../core/perf/perf_analyzer';
 import { GlobalConfig } from '../../config/types';
 import { getConfig, initConfig, updateKindConfig } from '../../config';
 import { traceStreamerCmd } from '../../services/external/trace_streamer';
-import { checkPerfFiles, copyDirectory, copyFile, getSceneRoundsFolders } from '../../utils/folder_utils';
+import {
+    checkPerfFiles,
+    copyDirectory,
+    copyFile,
+    getSceneRoundsFolders,
+    SESSION_DIR,
+    STEP_WINDOW_FILE,
+} from '../../utils/folder_utils';
 import { saveJsonArray } from '../../utils/json_utils';
 import { Round, TestSceneInfo, TestStepGroup } from '../../core/perf/perf_analyzer_base';
 
 const logger = Logger.getLogger(LOG_MODULE_TYPE.TOOL);
 
-export const DbtoolsCli = new Command('dbtools')
-    .requiredOption('-i, --input <string>', 'scene test report path')
-    .option('--choose', 'choose one from rounds', false)
-    .option('--disable-dbtools', 'disable dbtools', false)
-    .option('-s, --soDir <string>', '--So_dir soDir', '')
-    .option('-k, --kind-config <string>', 'custom kind configuration in JSON format')
-    .action(async (...args: any[]) => {
-        let cliArgs: Partial<GlobalConfig> = { ...args[0] };
-        initConfig(cliArgs, (config) => {
-            config.choose = args[0].choose;
-            config.inDbtools = !args[0].disableDbtools;
-            if (args[0].kindConfig) {
-                updateKindConfig(config, args[0].kindConfig);
-            }
+export function createDbtoolsCli(): Command {
+    return new Command('dbtools')
+        .requiredOption('-i, --input <string>', 'scene test report path')
+        .option('--choose', 'choose one from rounds', false)
+        .option('--disable-dbtools', 'disable dbtools', false)
+        .option('-s, --soDir <string>', '--So_dir soDir', '')
+        .option('-k, --kind-config <string>', 'custom kind configuration in JSON format')
+        .action(async (...args: any[]) => {
+            let cliArgs: Partial<GlobalConfig> = { ...args[0] };
+            initConfig(cliArgs, (config) => {
+                config.choose = args[0].choose;
+                config.inDbtools = !args[0].disableDbtools;
+                if (args[0].kindConfig) {
+                    updateKindConfig(config, args[0].kindConfig);
+                }
+            });
+
+            await main(args[0].input);
         });
-
-        await main(args[0].input);
-    });
+}
 
 // 定义 testinfo.json 数据的结构
 export interface TestInfo {
@@ -167,6 +176,12 @@ async function calculateRoundResults(roundFolders: string[], step: Step): Promis
         const dbPath = path.join(roundFolders[index], 'hiperf', `step${step.stepIdx}`, 'perf.db');
 
         if (!fs.existsSync(dbPath)) {
+            if (!fs.existsSync(perfDataPath)) {
+                // 连续采集的步骤由 perf_testing 在选择轮次前拆分出 perf.db
+                logger.error(`${dbPath} 不存在，连续采集的数据尚未拆分`);
+                results[index] = 0;
+                continue;
+            }
             await traceStreamerCmd(perfDataPath, dbPath);
         }
 
@@ -218,6 +233,29 @@ async function copySelectedRoundData(sourceRound: string, destPath: string, step
         copyDirectory(srcHtraceDir, destHtraceDir),
         copyDirectory(srcResultDir, destResultDir),
     ]);
+
+    if (sourceRound !== destPath && fs.existsSync(path.join(srcPerfDir, STEP_WINDOW_FILE))) {
+        await copySessionTrace(sourceRound, destPath, destPerfDir);
+    }
+}
+
+// 连续采集：每个被选中的轮次只复制一次会话 trace，并在步骤标记中记录其位置，分析时按时间窗口拆分
+async function copySessionTrace(sourceRound: string, destPath: string, destPerfDir: string): Promise<void> {
+    const sessionName = `${SESSION_DIR}/${path.basename(sourceRound)}`;
+    const srcSessionDir = path.join(sourceRound, SESSION_DIR);
+    const destSessionDir = path.join(destPath, SESSION_DIR, path.basename(sourceRound));
+
+    for (const fileName of ['trace.htrace', 'step_windows.json']) {
+        const srcFile = path.join(srcSessionDir, fileName);
+        if (fs.existsSync(srcFile)) {
+            await copyFile(srcFile, path.join(destSessionDir, fileName), { overwrite: false });
+        }
+    }
+
+    const markerPath = path.join(destPerfDir, STEP_WINDOW_FILE);
+    const marker = await loadJsonFile<Record<string, unknown>>(markerPath);
+    marker.session = sessionName;
+    await fs.promises.writeFile(markerPath, JSON.stringify(marker, null, 4), 'utf8');
 }
 
 // 解析结果 XML 文件
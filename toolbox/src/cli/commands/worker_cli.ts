@@ -0,0 +1,72 @@
+/*
+ * Copyright (c) 2025 Huawei Device Co., Ltd.
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+import readline from 'readline';
+import { Command } from 'commander';
+import Logger, { LOG_MODULE_TYPE } from 'arkanalyzer/lib/utils/logger';
+
+const logger = Logger.getLogger(LOG_MODULE_TYPE.TOOL);
+
+// Prefix of the line that ends the output of a request
+const DONE_PREFIX = '@worker-done ';
+
+interface WorkerRequest {
+    id: number;
+    args: string[];
+}
+
+function exitOverrideAll(command: Command): void {
+    command.exitOverride();
+    for (const sub of command.commands) {
+        exitOverrideAll(sub);
+    }
+}
+
+/**
+ * Long-lived worker: reads one JSON request {id, args} per stdin line and runs `hapray <args>`
+ * with a freshly built command tree, so the toolbox is loaded only once. Requests run one at a
+ * time; their output is followed by a `@worker-done {id, ok, error}` line.
+ */
+export function createWorkerCli(createCommands: () => Command[]): Command {
+    return new Command('worker').action(async () => {
+        const rl = readline.createInterface({ input: process.stdin, terminal: false });
+        for await (const line of rl) {
+            if (!line.trim()) {
+                continue;
+            }
+            let request: WorkerRequest;
+            try {
+                request = JSON.parse(line);
+            } catch (error) {
+                logger.error(`Invalid worker request: ${line}`);
+                continue;
+            }
+
+            let ok = true;
+            let message: string | undefined;
+            try {
+                const program = new Command('hapray');
+                createCommands().forEach((command) => program.addCommand(command));
+                exitOverrideAll(program);
+                await program.parseAsync(request.args, { from: 'user' });
+            } catch (error) {
+                ok = false;
+                message = (error as Error).message;
+                logger.error(`Worker request ${request.id} failed: ${message}`);
+            }
+            console.log(DONE_PREFIX + JSON.stringify({ id: request.id, ok: ok, error: message }));
+        }
+    });
+}
@@ -15,18 +15,19 @@
 
 import { Command, program } from 'commander';
 import Logger, { LOG_LEVEL, LOG_MODULE_TYPE } from 'arkanalyzer/lib/utils/logger';
-import { HapAnalyzerCli } from './commands/hap_analyzer_cli';
-import { DbtoolsCli } from './commands/hapray_cli';
-import { ElfAnalyzerCli } from './commands/elf_analyzer_cli';
+import { createHapAnalyzerCli } from './commands/hap_analyzer_cli';
+import { createDbtoolsCli } from './commands/hapray_cli';
+import { createElfAnalyzerCli } from './commands/elf_analyzer_cli';
+import { createWorkerCli } from './commands/worker_cli';
 
 Logger.configure('arkanalyzer-hapray.log', LOG_LEVEL.ERROR, LOG_LEVEL.INFO, true);
 const logger = Logger.getLogger(LOG_MODULE_TYPE.TOOL);
 const VERSION = '1.1.0';
 
 const HaprayCli = new Command('hapray').version(VERSION);
-HaprayCli.addCommand(HapAnalyzerCli);
-HaprayCli.addCommand(DbtoolsCli);
-HaprayCli.addCommand(ElfAnalyzerCli);
+const createCommands = (): Command[] => [createHapAnalyzerCli(), createDbtoolsCli(), createElfAnalyzerCli()];
+createCommands().forEach((command) => HaprayCli.addCommand(command));
+HaprayCli.addCommand(createWorkerCli(createCommands));
 
 try {
     program
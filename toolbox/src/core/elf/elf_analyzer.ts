@@ -18,7 +18,7 @@ import * as fs from 'fs';
 import { Logger, LOG_MODULE_TYPE } from 'arkanalyzer';
 import { ELF, parseELF } from './elfy';
 import { getAllFiles } from '../../utils/file_utils';
-import initSqlJs from 'sql.js';
+import initSqlJs, { Database } from 'sql.js';
 import { demangle } from './demangle';
 
 const logger = Logger.getLogger(LOG_MODULE_TYPE.TOOL);
@@ -28,6 +28,11 @@ export interface InvokeSymbol {
     invoke: boolean;
 }
 
+export interface ElfTask {
+    input: string;
+    output: string;
+}
+
 export class ElfAnalyzer {
     private static instance: ElfAnalyzer;
 
@@ -82,18 +87,54 @@ export class ElfAnalyzer {
     }
 
     public async getInvokeSymbols(filePath: string, perfPath: string, cache_file: string): Promise<InvokeSymbol[]> {
-        let result: InvokeSymbol[] = [];
+        const perfDbs = await this.loadPerfDbs(perfPath);
+        try {
+            return await this.resolveInvokeSymbols(filePath, perfDbs, cache_file);
+        } finally {
+            perfDbs.forEach((db) => db.close());
+        }
+    }
+
+    /**
+     * Analyze many ELF files against one report directory, loading the perf databases only once.
+     * onResult is called as soon as the symbols of a file are known.
+     */
+    public async getInvokeSymbolsBatch(
+        tasks: ElfTask[],
+        perfPath: string,
+        onResult: (task: ElfTask, symbols: InvokeSymbol[] | null, error?: Error) => void
+    ): Promise<void> {
+        const perfDbs = await this.loadPerfDbs(perfPath);
+        try {
+            for (const task of tasks) {
+                try {
+                    onResult(task, await this.resolveInvokeSymbols(task.input, perfDbs, task.output));
+                } catch (error) {
+                    logger.error(`Failed to analyze ${task.input}: ${(error as Error).message}`);
+                    onResult(task, null, error as Error);
+                }
+            }
+        } finally {
+            perfDbs.forEach((db) => db.close());
+        }
+    }
 
+    private async loadPerfDbs(perfPath: string): Promise<Database[]> {
         let perfFiles = getAllFiles(perfPath, { exts: ['.db'] }).filter((value) => {
             let hiperf = path.dirname(path.dirname(value));
             let scene = path.dirname(hiperf);
             return path.basename(hiperf) === 'hiperf' && !path.basename(scene).match(/.*_round\d$/);
         });
+        let SQL = await initSqlJs();
+        return perfFiles.map((dbFile) => new SQL.Database(fs.readFileSync(dbFile)));
+    }
+
+    private async resolveInvokeSymbols(filePath: string, perfDbs: Database[], cache_file: string): Promise<InvokeSymbol[]> {
+        let result: InvokeSymbol[] = [];
+
         // get all invoked symbols
         let invokeSymbols = new Set<string>();
-        let SQL = await initSqlJs();
-        for (const dbFile of perfFiles) {
-            const db = new SQL.Database(fs.readFileSync(dbFile));
+        for (const db of perfDbs) {
             const results = db.exec(`SELECT symbol FROM perf_files where path like '%${path.basename(filePath)}%'`);
             if (results.length === 0) {
                 continue;
@@ -19,6 +19,17 @@ import * as path from 'path';
 
 const logger = Logger.getLogger(LOG_MODULE_TYPE.TOOL);
 
+// 连续采集时步骤目录只有时间窗口标记，原始数据统一保存在轮次的 session 目录下
+export const SESSION_DIR = 'session';
+export const STEP_WINDOW_FILE = 'step_window.json';
+
+/**
+ * 步骤是否有采集数据：单独采集的 perf.data，或连续采集的时间窗口标记
+ */
+export function hasStepData(stepDir: string): boolean {
+    return fs.existsSync(path.join(stepDir, 'perf.data')) || fs.existsSync(path.join(stepDir, STEP_WINDOW_FILE));
+}
+
 export function getFirstLevelFolders(dirPath: string): string[] {
     try {
         // 读取指定目录下的所有文件和文件夹
@@ -64,8 +75,7 @@ export function checkPerfData(dir: string) {
     const stepDirs = getFirstLevelFolders(hiperfDir);
     if (stepDirs.length !== 0) {
         stepDirs.forEach((stepDir) => {
-            const perfDataPath = path.join(stepDir, 'perf.data');
-            if (!fs.existsSync(perfDataPath)) {
+            if (!hasStepData(stepDir)) {
                 hasPerfData = false;
             }
         });
@@ -167,8 +177,7 @@ export async function checkPerfFiles(dirPath: string, summaryCount: number): Pro
     const hiperfDir = path.join(dirPath, 'hiperf');
     const hiperfStepDirs = getFirstLevelFolders(hiperfDir);
     hiperfStepDirs.forEach((hiperfStepDir) => {
-        const perfDataPath = path.join(hiperfStepDir, 'perf.data');
-        if (fs.existsSync(perfDataPath)) {
+        if (hasStepData(hiperfStepDir)) {
             hiperfDataCount++;
         }
     });